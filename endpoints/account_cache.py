@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from .database_config import DatabaseConfig
+
+
+class CachedAccount(NamedTuple):
+    account_id: str
+    # 已知的成员关系（租户ID与角色）；未知时为None
+    tenant_id: Optional[str] = None
+    role: Optional[str] = None
+
+
+class AccountCache:
+    """
+    邮箱 -> (账户ID, 成员角色) 的读穿缓存，按条数做LRU淘汰，条目超过 ttl 秒后失效。
+    只缓存存在的账户；本服务的写路径在提交后更新或清除对应条目，
+    其他进程或Dify自身的修改最多在 ttl 秒后可见。
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, CachedAccount]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, email: str) -> Optional[CachedAccount]:
+        with self._lock:
+            item = self._entries.get(email)
+            if item is not None and item[0] < time.monotonic():
+                del self._entries[email]
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(email)
+            self.hits += 1
+            return item[1]
+
+    def put(self, email: str, account_id: str, tenant_id: Optional[str] = None, role: Optional[str] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries.pop(email, None)
+            self._entries[email] = (time.monotonic() + self.ttl, CachedAccount(account_id, tenant_id, role))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, emails: Iterable[str]) -> None:
+        with self._lock:
+            for email in emails:
+                if self._entries.pop(email, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "invalidations": self.invalidations,
+            }
+
+
+_cache: Optional[AccountCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_account_cache() -> AccountCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = DatabaseConfig()
+                _cache = AccountCache(config.ACCOUNT_CACHE_SIZE, config.ACCOUNT_CACHE_TTL_SECONDS)
+    return _cache
+
+
+def account_cache_stats() -> Dict[str, Any]:
+    return get_account_cache().stats()
@@ -1,20 +1,44 @@
+import os
 import uuid
+import zlib
 import secrets
 import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 
-from sqlalchemy import func
+from sqlalchemy import bindparam, exists, func, select, text, tuple_, update
 import logging
 from dify_plugin.config.logger_format import plugin_logger_handler
 
-from .db_engine import db
+from .db_engine import db, read_session
+from .account_cache import CachedAccount, get_account_cache
 from .database_config import DatabaseConfig
+from .bulk_loader import copy_rows, insert_rows, is_postgres, iter_chunks
+from .chunking import AdaptiveChunker
+from .retry import run_with_retry, transient_reason
 from .password import hash_password
+from .payload_schemas import dedupe_sync_accounts, parse_sync_accounts
 # 使用自定义处理器设置日志
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 logger.addHandler(plugin_logger_handler)
+def generate_password_fields(password: str) -> Tuple[str, str]:
+    """生成密码盐并加密密码，返回 (base64密码哈希, base64盐)"""
+    # 生成密码盐
+    salt = secrets.token_bytes(16)
+    base64_salt = base64.b64encode(salt).decode()
+
+    # 加密密码
+    password_hashed = hash_password(password, salt)
+    base64_password_hashed = base64.b64encode(password_hashed).decode()
+    return base64_password_hashed, base64_salt
+
+def _escape_like(value: str) -> str:
+    """转义LIKE模式中的通配符"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
 # 初始化数据库的函数
 def init_account_management_db(app=None):
     if db.app is None and app is not None:
@@ -101,6 +125,29 @@ class NoPermissionError(Exception):
 class RoleAlreadyAssignedError(Exception):
     pass
 
+# 批量导入时每次IN查询的键数量
+BULK_LOOKUP_CHUNK_SIZE = 1000
+
+# 批量导入写入 accounts 的列
+ONBOARDING_ACCOUNT_COLUMNS = (
+    'id', 'email', 'name', 'password', 'password_salt', 'interface_language',
+    'interface_theme', 'timezone', 'status', 'created_at', 'updated_at',
+)
+
+# 单账户操作的热点查询：语句只构造一次，缓存键在语句对象上记忆化，
+# 每次执行只绑定参数并命中引擎的 compiled_cache，不再重新构造Query和计算缓存键
+ACCOUNT_BY_EMAIL = select(Account).where(Account.email == bindparam('email')).limit(1)
+ACCOUNT_ID_BY_EMAIL = select(Account.id).where(Account.email == bindparam('email')).limit(1)
+TENANT_JOIN_BY_MEMBER = select(TenantAccountJoin).where(
+    TenantAccountJoin.tenant_id == bindparam('tenant_id'),
+    TenantAccountJoin.account_id == bindparam('account_id'),
+).limit(1)
+TENANT_JOINS_BY_ACCOUNT = select(TenantAccountJoin).where(TenantAccountJoin.account_id == bindparam('account_id'))
+SET_TENANT_JOIN_ROLE = update(TenantAccountJoin).where(
+    TenantAccountJoin.tenant_id == bindparam('member_tenant_id'),
+    TenantAccountJoin.account_id == bindparam('member_account_id'),
+).values(role=bindparam('new_role'), updated_at=bindparam('new_updated_at')).execution_options(synchronize_session=False)
+
 # 服务类实现
 class AccountManagementService:
     # 语言与时区映射
@@ -127,123 +174,655 @@ class AccountManagementService:
         "th-TH": "Asia/Bangkok",
     }
     @staticmethod
-    def sync_accounts(sync_data, app_context=None):
+    def sync_accounts(sync_data, app_context=None, chunker: Optional[AdaptiveChunker] = None):
         """
         同步账户数据
-        :param sync_data: 同步数据列表
+        :param sync_data: 同步数据列表（原始字典或已校验的SyncAccountRecord）
         :param app_context: Flask应用上下文
+        :param chunker: 自适应分块器，按内存水位调整每块记录数；不传时使用配置创建
         :return: 同步结果
         """
-        results = []
+        # 在进入数据库事务之前完成整批校验
+        records = parse_sync_accounts(sync_data)
+        # 批次内去重，重复或冲突的记录不进入数据库阶段
+        records, results = dedupe_sync_accounts(records)
+        if results:
+            logger.info(f"同步批次中跳过 {len(results)} 条重复/冲突记录")
+        chunker = chunker or AdaptiveChunker.from_config()
         try:
             # 开始事务
             db.session.begin()
-            
-            for user_data in sync_data:
-                # 使用id作为唯一标识
-                user_id = str(user_data.get("id"))
-                real_name = user_data.get("realName")
-                phone = user_data.get("phone")
-                # 从数据库查询第一个租户id
-                first_tenant = Tenant.query.first()
-                if not first_tenant:
-                    raise TenantNotFoundError("数据库中未找到租户信息")
-                tenant_id = first_tenant.id
-                is_admin = user_data.get("admin", False)
-                role_name = user_data.get("roleName")
-                
-                # 这里我们假设使用phone或id生成email
-                email = f"{phone}@taidesk.com" if phone else f"u_{user_id}@taidesk.com"
-                
-                try:
+
+            # 从数据库查询第一个租户id
+            first_tenant = Tenant.query.first()
+            if not first_tenant:
+                raise TenantNotFoundError("数据库中未找到租户信息")
+            tenant_id = first_tenant.id
+
+            for chunk in chunker.chunks(records, db.session):
+                # 每块是一个事务：块内不逐条提交，成功后提交一次；
+                # 死锁/序列化失败时回滚整块（之前的块已提交，不受影响）后从头重试
+                results.extend(run_with_retry(
+                    lambda: AccountManagementService._sync_account_chunk(chunk, tenant_id),
+                    rollback=db.session.rollback,
+                    description="账户同步块"
+                ))
+                # 块内的写入不更新缓存，提交后清除这些邮箱，下次读取时重新加载
+                get_account_cache().invalidate(record.email for record in chunk)
+            return results
+        except Exception as e:
+            # 回滚事务
+            db.session.rollback()
+            print(f"同步账户事务失败: {str(e)}")
+            raise
+
+    @staticmethod
+    def _sync_account_chunk(chunk, tenant_id: str) -> List[Dict[str, Any]]:
+        """
+        在一个事务中同步一个块的账户并提交。每条记录在SAVEPOINT中写入，非瞬时错误只影响该记录；
+        瞬时错误向上抛出，由调用方回滚整个块后重试，因此重试时块内没有已提交的记录。
+        """
+        chunk_results = []
+        # 缓存命中的邮箱视为已存在（过期的条目由 update_account 回退为创建），其余每块一次查询
+        cache = get_account_cache()
+        existing_emails = {record.email for record in chunk if cache.get(record.email) is not None}
+        uncached = [record.email for record in chunk if record.email not in existing_emails]
+        if uncached:
+            existing_emails.update(db.session.scalars(select(Account.email).where(Account.email.in_(uncached))))
+        for record in chunk:
+            # 使用id作为唯一标识
+            user_id = record.id
+            real_name = record.real_name
+            role = record.role
+            email = record.email
+
+            try:
+                with db.session.begin_nested():
                     # 检查用户是否存在
-                    existing_account = AccountManagementService.get_account_by_email(email)
-                    
-                    if existing_account:
-                        # 更新用户
-                        result = AccountManagementService.update_account(
-                            email=email,
-                            name=real_name,
-                            tenant_id=tenant_id,
-                            role="admin" if is_admin else role_name if role_name else "normal"
-                        )
-                        results.append({
-                            "user_id": user_id,
-                            "status": "updated",
-                            "data": result
-                        })
+                    if email in existing_emails:
+                        try:
+                            # 更新用户
+                            result = AccountManagementService.update_account(
+                                email=email,
+                                name=real_name,
+                                tenant_id=tenant_id,
+                                role=role,
+                                commit=False
+                            )
+                            status = "updated"
+                        except AccountNotFoundError:
+                            # 缓存过期，用户已不存在，创建新用户
+                            result = AccountManagementService.create_account(
+                                email=email,
+                                name=record.account_name,
+                                password=str(email),
+                                tenant_id=tenant_id,
+                                role=role,
+                                commit=False
+                            )
+                            status = "created"
                     else:
                         # 创建用户
                         result = AccountManagementService.create_account(
                             email=email,
-                            name=real_name,
+                            name=record.account_name,
                             password=str(email),
                             tenant_id=tenant_id,
-                            role="admin" if is_admin else role_name if role_name else "normal"
+                            role=role,
+                            commit=False
                         )
-                        results.append({
-                            "user_id": user_id,
-                            "status": "created",
-                            "data": result
-                        })
-                except AccountNotFoundError:
-                    # 用户不存在，创建新用户
-                    result = AccountManagementService.create_account(
-                        email=email,
-                        name=real_name,
-                        password=str(email),
-                        tenant_id=tenant_id,
-                        role="admin" if is_admin else role_name if role_name else "normal"
-                    )
-                    results.append({
-                        "user_id": user_id,
-                        "status": "created",
-                        "data": result
-                    })
-                except Exception as e:
-                    print(f"同步用户数据异常 (user_id: {user_id}): {str(e)}")
-                    results.append({
-                        "user_id": user_id,
-                        "status": "error",
-                        "error": str(e)
-                    })
-            
-            # 提交事务
+                        status = "created"
+                chunk_results.append({
+                    "user_id": user_id,
+                    "status": status,
+                    "data": result
+                })
+            except Exception as e:
+                # 死锁/序列化失败交给外层按块回滚后重试
+                if transient_reason(e):
+                    raise
+                print(f"同步用户数据异常 (user_id: {user_id}): {str(e)}")
+                chunk_results.append({
+                    "user_id": user_id,
+                    "status": "error",
+                    "error": str(e)
+                })
+        db.session.commit()
+        return chunk_results
+
+    @staticmethod
+    def bulk_onboard_accounts(sync_data) -> List[Dict[str, Any]]:
+        """
+        首次接入大租户时的批量导入：新账户与成员关系先通过 COPY 写入临时暂存表，
+        再用集合SQL合并到 accounts 与 tenant_account_joins；非PostgreSQL后端回退为分块多行INSERT。
+        已存在的账户只同步姓名和角色，不重新计算密码。
+        :param sync_data: 同步数据列表（原始字典或已校验的SyncAccountRecord）
+        :return: 同步结果
+        """
+        records = parse_sync_accounts(sync_data)
+        records, results = dedupe_sync_accounts(records)
+        try:
+            first_tenant = Tenant.query.first()
+            if not first_tenant:
+                raise TenantNotFoundError("数据库中未找到租户信息")
+            tenant_id = first_tenant.id
+
+            # 批量查询已存在的账户
+            existing = {}
+            for chunk in iter_chunks([record.email for record in records], BULK_LOOKUP_CHUNK_SIZE):
+                rows = db.session.query(Account.id, Account.email, Account.name).filter(Account.email.in_(chunk))
+                for account_id, email, name in rows:
+                    existing[email] = (account_id, name)
+            new_records = [record for record in records if record.email not in existing]
+
+            # PBKDF2计算会释放GIL，使用线程池并行生成密码
+            with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as executor:
+                password_fields = list(executor.map(generate_password_fields, [record.email for record in new_records]))
+
+            now = datetime.utcnow()
+            account_rows = AccountManagementService._build_account_rows(new_records, password_fields, now)
+            member_rows = AccountManagementService._build_member_rows(records)
+
+            connection = db.session.connection()
+            if is_postgres(connection):
+                AccountManagementService._merge_onboarding_with_copy(connection, tenant_id, account_rows, member_rows, now)
+            else:
+                AccountManagementService._merge_with_inserts(
+                    connection, tenant_id, account_rows, member_rows, existing, now
+                )
             db.session.commit()
-            return results
         except Exception as e:
-            # 回滚事务
             db.session.rollback()
-            print(f"同步账户事务失败: {str(e)}")
+            print(f"批量导入账户事务失败: {str(e)}")
             raise
+        # 集合SQL直接改写了姓名和角色
+        get_account_cache().invalidate(record.email for record in records)
+
+        logger.info(f"批量导入账户完成: 新建 {len(new_records)}, 更新 {len(records) - len(new_records)}")
+        for record in records:
+            results.append({
+                "user_id": record.id,
+                "status": "updated" if record.email in existing else "created",
+            })
+        return results
+
+    @staticmethod
+    def _build_account_rows(records, password_fields, now) -> List[Dict[str, Any]]:
+        """根据同步记录和已生成的密码构造 accounts 表的插入行"""
+        timezone = AccountManagementService.language_timezone_mapping.get('en-US', 'UTC')
+        account_rows = []
+        for record, (password, password_salt) in zip(records, password_fields):
+            account_rows.append({
+                'id': str(uuid.uuid4()),
+                'email': record.email,
+                'name': record.account_name,
+                'password': password,
+                'password_salt': password_salt,
+                'interface_language': 'en-US',
+                'interface_theme': 'light',
+                'timezone': timezone,
+                'status': 'active',
+                'created_at': now,
+                'updated_at': now,
+            })
+        return account_rows
+
+    @staticmethod
+    def _build_member_rows(records) -> List[Dict[str, Any]]:
+        """构造期望的成员角色（邮箱、姓名、角色）；姓名为None表示不修改"""
+        return [
+            {
+                'email': record.email,
+                'name': record.real_name,
+                'role': TenantAccountRole.ADMIN if record.role.lower() == 'admin' else TenantAccountRole.NORMAL,
+            }
+            for record in records
+        ]
+
+    @staticmethod
+    def _merge_onboarding_with_copy(connection, tenant_id, account_rows, member_rows, now):
+        """PostgreSQL：COPY写入临时暂存表后集合合并"""
+        account_columns = list(ONBOARDING_ACCOUNT_COLUMNS)
+        column_list = ", ".join(account_columns)
+        connection.execute(text(
+            f"CREATE TEMP TABLE taidesk_stage_accounts ON COMMIT DROP AS "
+            f"SELECT {column_list} FROM accounts WITH NO DATA"
+        ))
+        connection.execute(text(
+            "CREATE TEMP TABLE taidesk_stage_members "
+            "(email VARCHAR(255) NOT NULL, name VARCHAR(255), role VARCHAR(16) NOT NULL) ON COMMIT DROP"
+        ))
+        copy_rows(connection, "taidesk_stage_accounts", account_columns,
+                  [[row[column] for column in account_columns] for row in account_rows])
+        copy_rows(connection, "taidesk_stage_members", ["email", "name", "role"],
+                  [[row['email'], row['name'], row['role']] for row in member_rows])
+
+        params = {"tenant_id": tenant_id, "now": now}
+        # Dify的 accounts.email 上没有唯一约束，不能用 ON CONFLICT (email)；以反连接跳过已存在的邮箱
+        connection.execute(text(
+            f"INSERT INTO accounts ({column_list}) SELECT {column_list} FROM taidesk_stage_accounts s "
+            f"WHERE NOT EXISTS (SELECT 1 FROM accounts a WHERE a.email = s.email)"
+        ))
+        connection.execute(text(
+            "UPDATE accounts a SET name = s.name, updated_at = :now "
+            "FROM taidesk_stage_members s "
+            "WHERE a.email = s.email AND s.name IS NOT NULL AND a.name IS DISTINCT FROM s.name"
+        ), params)
+        connection.execute(text(
+            "UPDATE tenant_account_joins j SET role = s.role, updated_at = :now "
+            "FROM taidesk_stage_members s JOIN accounts a ON a.email = s.email "
+            "WHERE j.account_id = a.id AND j.tenant_id = :tenant_id AND j.role <> s.role"
+        ), params)
+        connection.execute(text(
+            "INSERT INTO tenant_account_joins (tenant_id, account_id, role, current, created_at, updated_at) "
+            "SELECT t.id, a.id, s.role, false, :now, :now "
+            "FROM taidesk_stage_members s JOIN accounts a ON a.email = s.email JOIN tenants t ON t.id = :tenant_id "
+            "WHERE NOT EXISTS (SELECT 1 FROM tenant_account_joins j WHERE j.tenant_id = t.id AND j.account_id = a.id)"
+        ), params)
+
+    @staticmethod
+    def _merge_with_inserts(connection, tenant_id, account_rows, member_rows, existing, now):
+        """分块多行INSERT/UPDATE（非PostgreSQL后端的批量导入，以及分区并行写入）"""
+        insert_rows(connection, Account.__table__, account_rows)
+
+        account_table = Account.__table__
+        renamed = [
+            {'b_email': row['email'], 'b_name': row['name']}
+            for row in member_rows
+            if row['email'] in existing and row['name'] is not None and existing[row['email']][1] != row['name']
+        ]
+        if renamed:
+            connection.execute(
+                update(account_table)
+                .where(account_table.c.email == bindparam('b_email'))
+                .values(name=bindparam('b_name'), updated_at=now),
+                renamed
+            )
+
+        account_ids = {row['email']: row['id'] for row in account_rows}
+        account_ids.update({email: value[0] for email, value in existing.items()})
+        current_roles = {}
+        for chunk in iter_chunks(list(account_ids.values()), BULK_LOOKUP_CHUNK_SIZE):
+            rows = connection.execute(
+                select(TenantAccountJoin.account_id, TenantAccountJoin.role).where(
+                    TenantAccountJoin.tenant_id == tenant_id,
+                    TenantAccountJoin.account_id.in_(chunk)
+                )
+            )
+            current_roles.update({account_id: role for account_id, role in rows})
+
+        join_table = TenantAccountJoin.__table__
+        new_joins, changed_roles = AccountManagementService._diff_memberships(
+            tenant_id, member_rows, account_ids, current_roles, now
+        )
+        insert_rows(connection, join_table, new_joins)
+        if changed_roles:
+            connection.execute(
+                update(join_table)
+                .where(join_table.c.tenant_id == tenant_id, join_table.c.account_id == bindparam('b_account_id'))
+                .values(role=bindparam('b_role'), updated_at=now),
+                changed_roles
+            )
+
+    @staticmethod
+    def sync_accounts_partitioned(sync_data, partitions: int) -> List[Dict[str, Any]]:
+        """
+        分区并行同步账户：按派生邮箱的哈希将批次划分为互不相交的分区，
+        每个分区在连接池中独立的连接和事务上并发写入，最后合并各分区结果。
+        分区数不超过 SYNC_MAX_PARTITIONS，且最多占用连接池的一半，其余连接留给并发请求。
+        :param sync_data: 同步数据列表（原始字典或已校验的SyncAccountRecord）
+        :param partitions: 期望的分区数
+        :return: 同步结果
+        """
+        records = parse_sync_accounts(sync_data)
+        records, results = dedupe_sync_accounts(records)
+        config = DatabaseConfig()
+        partitions = max(1, min(partitions, config.SYNC_MAX_PARTITIONS, config.SQLALCHEMY_POOL_SIZE // 2))
+
+        first_tenant = Tenant.query.first()
+        if not first_tenant:
+            raise TenantNotFoundError("数据库中未找到租户信息")
+        tenant_id = first_tenant.id
+
+        existing = {}
+        for chunk in iter_chunks([record.email for record in records], BULK_LOOKUP_CHUNK_SIZE):
+            rows = db.session.query(Account.id, Account.email, Account.name).filter(Account.email.in_(chunk))
+            for account_id, email, name in rows:
+                existing[email] = (account_id, name)
+        db.session.close()
+
+        buckets = [[] for _ in range(partitions)]
+        for record in records:
+            buckets[zlib.crc32(record.email.encode('utf-8')) % partitions].append(record)
+
+        engine = db.engine
+
+        def write_partition(index, bucket):
+            new_records = [record for record in bucket if record.email not in existing]
+            now = datetime.utcnow()
+            password_fields = [generate_password_fields(record.email) for record in new_records]
+            account_rows = AccountManagementService._build_account_rows(new_records, password_fields, now)
+            member_rows = AccountManagementService._build_member_rows(bucket)
+            bucket_existing = {record.email: existing[record.email] for record in bucket if record.email in existing}
+
+            def write():
+                with engine.begin() as connection:
+                    AccountManagementService._merge_with_inserts(
+                        connection, tenant_id, account_rows, member_rows, bucket_existing, now
+                    )
+
+            # 每个分区是独立事务，死锁/序列化失败时只重试该分区
+            run_with_retry(write, description=f"分区 {index}")
+            return {"partition": index, "created": len(new_records), "updated": len(bucket) - len(new_records)}
+
+        partition_results = []
+        with ThreadPoolExecutor(max_workers=partitions) as executor:
+            futures = {
+                executor.submit(write_partition, index, bucket): index
+                for index, bucket in enumerate(buckets) if bucket
+            }
+            for future, index in futures.items():
+                try:
+                    partition_results.append(future.result())
+                except Exception as e:
+                    logger.error(f"分区 {index} 同步失败: {str(e)}")
+                    partition_results.append({"partition": index, "error": str(e)})
+        get_account_cache().invalidate(record.email for record in records)
+
+        failed = {item["partition"]: item["error"] for item in partition_results if "error" in item}
+        for index, bucket in enumerate(buckets):
+            for record in bucket:
+                if index in failed:
+                    results.append({"user_id": record.id, "status": "error", "error": failed[index]})
+                else:
+                    results.append({
+                        "user_id": record.id,
+                        "status": "updated" if record.email in existing else "created",
+                    })
+        logger.info(f"分区并行同步完成: {sorted(partition_results, key=lambda item: item['partition'])}")
+        return results
+
+    @staticmethod
+    def _diff_memberships(tenant_id, member_rows, account_ids, current_roles, now):
+        """
+        对比期望的成员角色与数据库现状
+        :return: (需要新建的成员关系行, 需要更新角色的参数列表)
+        """
+        new_joins = []
+        changed_roles = []
+        for row in member_rows:
+            account_id = account_ids[row['email']]
+            if account_id not in current_roles:
+                new_joins.append({
+                    'tenant_id': tenant_id,
+                    'account_id': account_id,
+                    'role': row['role'],
+                    'current': False,
+                    'created_at': now,
+                    'updated_at': now,
+                })
+            elif current_roles[account_id] != row['role']:
+                changed_roles.append({'b_account_id': account_id, 'b_role': row['role']})
+        return new_joins, changed_roles
+
+    @staticmethod
+    def plan_sync_accounts(sync_data) -> List[Dict[str, Any]]:
+        """
+        只读计算一次同步会做什么：与同步相同的批量存在性查询，不计算密码、不写库。
+        逐用户返回 create / update（附 changes）/ noop，以及批次内的 duplicate / conflict；账户同步不删除账户。
+        :param sync_data: 同步数据列表（原始字典或已校验的SyncAccountRecord）
+        :return: 计划结果
+        """
+        records = parse_sync_accounts(sync_data)
+        records, results = dedupe_sync_accounts(records)
+
+        first_tenant = Tenant.query.first()
+        if not first_tenant:
+            raise TenantNotFoundError("数据库中未找到租户信息")
+        tenant_id = first_tenant.id
+
+        existing = {}
+        for chunk in iter_chunks([record.email for record in records], BULK_LOOKUP_CHUNK_SIZE):
+            rows = db.session.execute(
+                select(Account.id, Account.email, Account.name).where(Account.email.in_(chunk))
+            )
+            for account_id, email, name in rows:
+                existing[email] = (account_id, name)
+
+        current_roles = {}
+        for chunk in iter_chunks([value[0] for value in existing.values()], BULK_LOOKUP_CHUNK_SIZE):
+            rows = db.session.execute(
+                select(TenantAccountJoin.account_id, TenantAccountJoin.role).where(
+                    TenantAccountJoin.tenant_id == tenant_id,
+                    TenantAccountJoin.account_id.in_(chunk)
+                )
+            )
+            current_roles.update({account_id: role for account_id, role in rows})
+
+        for record, row in zip(records, AccountManagementService._build_member_rows(records)):
+            if record.email not in existing:
+                results.append({"user_id": record.id, "email": record.email, "status": "create"})
+                continue
+            account_id, name = existing[record.email]
+            changes = []
+            if row['name'] is not None and name != row['name']:
+                changes.append('name')
+            if account_id not in current_roles:
+                changes.append('membership')
+            elif current_roles[account_id] != row['role']:
+                changes.append('role')
+            entry = {"user_id": record.id, "email": record.email, "status": "update" if changes else "noop"}
+            if changes:
+                entry["changes"] = changes
+            results.append(entry)
+        return results
+
+    @staticmethod
+    def _find_account(email: str) -> Optional[Account]:
+        return db.session.scalars(ACCOUNT_BY_EMAIL, {'email': email}).first()
+
+    @staticmethod
+    def _load_account(email: str, cached: Optional[CachedAccount]) -> Optional[Account]:
+        """通过邮箱加载账户；缓存命中时按主键取（会话身份映射中已有时不查询）"""
+        if cached is not None:
+            account = db.session.get(Account, cached.account_id)
+            if account is not None and account.email == email:
+                return account
+            get_account_cache().invalidate([email])
+        return AccountManagementService._find_account(email)
+
+    @staticmethod
+    def _account_exists(email: str) -> Optional[str]:
+        """
+        返回邮箱对应的账户ID，不存在时为None。缓存命中时直接信任缓存的账户ID、不访问数据库：
+        本服务的更新、删除和改邮箱都会清除对应条目，其他进程的删除最多在 ttl 秒后可见
+        """
+        cached = get_account_cache().get(email)
+        if cached is not None:
+            return cached.account_id
+        account_id = AccountManagementService._find_account_id(email)
+        if account_id is not None:
+            get_account_cache().put(email, account_id)
+        return account_id
+
+    @staticmethod
+    def _find_account_id(email: str) -> Optional[str]:
+        return db.session.scalar(ACCOUNT_ID_BY_EMAIL, {'email': email})
+
+    @staticmethod
+    def _find_tenant_join(tenant_id: str, account_id: str) -> Optional[TenantAccountJoin]:
+        return db.session.scalars(TENANT_JOIN_BY_MEMBER, {'tenant_id': tenant_id, 'account_id': account_id}).first()
+
+    @staticmethod
+    def _set_tenant_join_role(tenant_id: str, account_id: str, role: str) -> int:
+        """不加载成员关系直接改写角色，返回更新的行数"""
+        return db.session.execute(SET_TENANT_JOIN_ROLE, {
+            'member_tenant_id': tenant_id,
+            'member_account_id': account_id,
+            'new_role': role,
+            'new_updated_at': datetime.utcnow(),
+        }).rowcount
+
+    @staticmethod
+    def _find_account_joins(account_id: str) -> List[TenantAccountJoin]:
+        return db.session.scalars(TENANT_JOINS_BY_ACCOUNT, {'account_id': account_id}).all()
 
     @staticmethod
     def get_account_by_email(email: str) -> Account:
         """通过邮箱查找账户"""
-        account = Account.query.filter_by(email=email).first()
+        account = AccountManagementService._load_account(email, get_account_cache().get(email))
         if not account:
             raise AccountNotFoundError(f"Account with email {email} not found")
         return account
 
     @staticmethod
-    def get_all_accounts() -> List[Dict[str, Any]]:
-        """获取所有账户信息"""
-        accounts = Account.query.all()
-        result = []
-        for account in accounts:
-            account_dict = {
-                'id': str(account.id),  # 确保id是字符串类型
-                'email': account.email,
-                'name': account.name,
-                'interface_language': account.interface_language,
-                'interface_theme': account.interface_theme,
-                'timezone': account.timezone,
-                'status': account.status,
-                'created_at': account.created_at.isoformat(),
-                'updated_at': account.updated_at.isoformat()
-            }
-            result.append(account_dict)
-        return result
+    def get_all_accounts(session=None) -> List[Dict[str, Any]]:
+        """获取所有账户信息；传入 read_session() 的会话时从只读副本读取"""
+        accounts = (session or db.session).scalars(select(Account)).all()
+        return [AccountManagementService._account_to_dict(account) for account in accounts]
+
+    @staticmethod
+    def _account_to_dict(account: Account) -> Dict[str, Any]:
+        # 时间字段保持datetime，由序列化层（orjson原生支持）统一输出ISO格式
+        return {
+            'id': str(account.id),  # 确保id是字符串类型
+            'email': account.email,
+            'name': account.name,
+            'interface_language': account.interface_language,
+            'interface_theme': account.interface_theme,
+            'timezone': account.timezone,
+            'status': account.status,
+            'created_at': account.created_at,
+            'updated_at': account.updated_at
+        }
+
+    @staticmethod
+    def _join_to_dict(join: TenantAccountJoin) -> Dict[str, Any]:
+        return {
+            'id': str(join.id),
+            'tenant_id': join.tenant_id,
+            'account_id': join.account_id,
+            'role': join.role,
+            'created_at': join.created_at,
+            'updated_at': join.updated_at
+        }
+
+    @staticmethod
+    def _keyset_page(model, since: Optional[datetime], position: Optional[List[Any]], limit: int):
+        """
+        按 (updated_at, id) 顺序做keyset分页，position为上一页最后一行的 [updated_at, id]；
+        游标中的id统一为字符串（成员关系的id是整数），比较前还原为列的类型
+        """
+        query = model.query
+        if position:
+            last_updated_at = datetime.fromisoformat(position[0])
+            last_id = model.id.type.python_type(position[1])
+            query = query.filter(tuple_(model.updated_at, model.id) > tuple_(last_updated_at, last_id))
+        elif since is not None:
+            query = query.filter(model.updated_at > since)
+        rows = query.order_by(model.updated_at, model.id).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if rows:
+            position = [rows[-1].updated_at.isoformat(), str(rows[-1].id)]
+        return rows, position, has_more
+
+    @staticmethod
+    def get_changes_since(since: Optional[datetime], cursor: Optional[Dict[str, Any]], limit: int) -> Dict[str, Any]:
+        """
+        增量变更流：返回 updated_at 晚于水位线的账户和租户成员关系，按 (updated_at, id) 排序做keyset分页。
+        两张表各自维护分页位置；next_cursor 既用于翻页，也可以保存下来作为下一次轮询的水位线。
+        游标中同时保存水位线，某张表还没有返回过行时从水位线继续，而不是从头开始。
+        物理删除的行不会出现在变更流中。
+        :param since: 水位线（UTC），为空时使用游标中的水位线；都没有时返回全部
+        :param cursor: 上一页返回的游标
+        :param limit: 每张表每页最多返回的行数
+        依赖的 (updated_at, id) 索引由 INDEX_BOOTSTRAP 检查或创建，读请求本身不建索引。
+        """
+        cursor = cursor or {}
+        if since is None and cursor.get('since'):
+            since = datetime.fromisoformat(cursor['since'])
+        accounts, account_position, accounts_more = AccountManagementService._keyset_page(
+            Account, since, cursor.get('accounts'), limit
+        )
+        joins, join_position, joins_more = AccountManagementService._keyset_page(
+            TenantAccountJoin, since, cursor.get('memberships'), limit
+        )
+        return {
+            'accounts': [AccountManagementService._account_to_dict(account) for account in accounts],
+            'memberships': [AccountManagementService._join_to_dict(join) for join in joins],
+            'has_more': accounts_more or joins_more,
+            'next_cursor': {
+                'accounts': account_position,
+                'memberships': join_position,
+                'since': since.isoformat() if since is not None else None,
+            },
+        }
+
+    @staticmethod
+    def search_accounts(
+        email_prefix: Optional[str] = None,
+        email_contains: Optional[str] = None,
+        name_prefix: Optional[str] = None,
+        name_contains: Optional[str] = None,
+        status: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+        role: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        服务端过滤搜索账户，按 (email, id) 做keyset分页。
+        PostgreSQL上前缀/子串匹配使用pg_trgm的GIN索引（不可用时回退为只支持前缀的pattern_ops索引），
+        其他数据库退化为普通LIKE。
+        注意大小写：*_contains 不区分大小写（ILIKE）；*_prefix 区分大小写（LIKE），
+        这样回退的pattern_ops索引也能用于前缀匹配（SQLite的LIKE对ASCII本身不区分大小写）。
+        索引由 INDEX_BOOTSTRAP 检查或创建，读请求本身不建索引。
+        """
+        query = select(Account)
+        if email_prefix:
+            query = query.filter(Account.email.like(f"{_escape_like(email_prefix)}%", escape="\\"))
+        if email_contains:
+            query = query.filter(Account.email.ilike(f"%{_escape_like(email_contains)}%", escape="\\"))
+        if name_prefix:
+            query = query.filter(Account.name.like(f"{_escape_like(name_prefix)}%", escape="\\"))
+        if name_contains:
+            query = query.filter(Account.name.ilike(f"%{_escape_like(name_contains)}%", escape="\\"))
+        if status:
+            query = query.filter(Account.status == status)
+        if tenant_id or role:
+            # 通过 tenant_account_joins 过滤工作空间与角色
+            membership = exists().where(TenantAccountJoin.account_id == Account.id)
+            if tenant_id:
+                membership = membership.where(TenantAccountJoin.tenant_id == tenant_id)
+            if role:
+                membership = membership.where(TenantAccountJoin.role == role)
+            query = query.filter(membership)
+        if cursor:
+            query = query.filter(tuple_(Account.email, Account.id) > tuple_(cursor['email'], cursor['id']))
+
+        # 只读查询，配置了只读副本时从副本读取
+        with read_session() as session:
+            accounts = session.scalars(query.order_by(Account.email, Account.id).limit(limit + 1)).all()
+        has_more = len(accounts) > limit
+        accounts = accounts[:limit]
+        next_cursor = None
+        if has_more:
+            next_cursor = {'email': accounts[-1].email, 'id': accounts[-1].id}
+        return {
+            'accounts': [AccountManagementService._account_to_dict(account) for account in accounts],
+            'has_more': has_more,
+            'next_cursor': next_cursor,
+        }
+
+    @staticmethod
+    def get_accounts_etag(session=None) -> str:
+        """账户列表的校验值：一次聚合查询得到的 count(*) 与 max(updated_at)；session 可以是会话或连接"""
+        count, last_updated_at = (session or db.session).execute(
+            select(func.count(Account.id), func.max(Account.updated_at))
+        ).one()
+        watermark = last_updated_at.isoformat() if last_updated_at else "0"
+        return hashlib.sha1(f"{count}:{watermark}".encode("utf-8")).hexdigest()
 
     @staticmethod
     def create_account(
@@ -253,11 +832,12 @@ class AccountManagementService:
         password: Optional[str] = None,
         interface_theme: str = 'light',
         role: str = 'normal',
-        tenant_id: Optional[str] = None
+        tenant_id: Optional[str] = None,
+        commit: bool = True
     ) -> Dict[str, Any]:
+        """commit=False 时只flush、不写入账户缓存，由调用方（如账户同步的块）统一提交"""
         # 检查账户是否已存在
-        existing_account = Account.query.filter_by(email=email).first()
-        if existing_account:
+        if AccountManagementService._account_exists(email) is not None:
             raise ValueError(f"Account with email {email} already exists")
 
         # 创建新账户
@@ -270,16 +850,7 @@ class AccountManagementService:
 
         # 处理密码
         if password:
-            # 生成密码盐
-            salt = secrets.token_bytes(16)
-            base64_salt = base64.b64encode(salt).decode()
-
-            # 加密密码
-            password_hashed = hash_password(password, salt)
-            base64_password_hashed = base64.b64encode(password_hashed).decode()
-
-            new_account.password = base64_password_hashed
-            new_account.password_salt = base64_salt
+            new_account.password, new_account.password_salt = generate_password_fields(password)
 
         # 设置时区
         new_account.timezone = AccountManagementService.language_timezone_mapping.get(interface_language, 'UTC')
@@ -288,12 +859,15 @@ class AccountManagementService:
 
         # 保存到数据库
         db.session.add(new_account)
-        db.session.commit()
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
 
         # 如果提供了租户ID，创建租户成员关系
         if tenant_id:
             # 检查租户是否存在
-            tenant = Tenant.query.get(tenant_id)
+            tenant = db.session.get(Tenant, tenant_id)
             if not tenant:
                 raise TenantNotFoundError(f"Tenant with id {tenant_id} not found")
 
@@ -310,7 +884,13 @@ class AccountManagementService:
                 role=final_role
             )
             db.session.add(new_join)
-            db.session.commit()
+            if commit:
+                db.session.commit()
+            else:
+                db.session.flush()
+
+        if commit:
+            get_account_cache().put(email, new_account.id, tenant_id, final_role if tenant_id else None)
 
         # 返回创建的账户信息
         result = {
@@ -336,20 +916,29 @@ class AccountManagementService:
         interface_language: Optional[str] = None,
         interface_theme: Optional[str] = None,
         role: Optional[str] = None,
-        tenant_id: Optional[str] = None
+        tenant_id: Optional[str] = None,
+        commit: bool = True
     ) -> Dict[str, Any]:
+        """
+        commit=False 时只flush、不更新账户缓存，由调用方（如写合并队列的批量刷新）统一提交，
+        并在提交成功后清除对应的缓存条目
+        """
         # 查找账户
-        account = Account.query.filter_by(email=email).first()
+        cache = get_account_cache()
+        cached = cache.get(email)
+        account = AccountManagementService._load_account(email, cached)
         if not account:
             raise AccountNotFoundError(f"Account with email {email} not found")
+        if cached is not None and cached.account_id != account.id:
+            cached = None
 
         # 更新账户信息
         if name is not None:
             account.name = name
         if new_email is not None:
             # 检查新邮箱是否已被使用
-            existing_account = Account.query.filter_by(email=new_email).first()
-            if existing_account and existing_account.id != account.id:
+            existing_id = AccountManagementService._account_exists(new_email)
+            if existing_id is not None and existing_id != account.id:
                 raise ValueError(f"Email {new_email} is already used by another account")
             account.email = new_email
         if interface_language is not None:
@@ -363,34 +952,31 @@ class AccountManagementService:
         # 如果提供了角色和租户ID，更新租户成员关系
         if role is not None and tenant_id is not None:
             # 检查租户是否存在
-            tenant = Tenant.query.get(tenant_id)
+            tenant = db.session.get(Tenant, tenant_id)
             if not tenant:
                 raise TenantNotFoundError(f"Tenant with id {tenant_id} not found")
 
-            # 查找租户成员关系
-            join = TenantAccountJoin.query.filter_by(
-                tenant_id=tenant_id,
-                account_id=account.id
-            ).first()
+            # 确定角色
+            if role.lower() == 'admin':
+                final_role = TenantAccountRole.ADMIN
+            else:
+                final_role = TenantAccountRole.NORMAL
 
-            if join:
-                # 确定角色
-                if role.lower() == 'admin':
-                    final_role = TenantAccountRole.ADMIN
-                else:
-                    final_role = TenantAccountRole.NORMAL
+            # 缓存中已有该成员关系时省去查询，直接按 (tenant_id, account_id) 改写角色；
+            # 缓存过期（成员关系已被删除）时未更新任何行，回退为查询后创建
+            join = None
+            updated = 0
+            if cached is not None and cached.tenant_id == tenant_id:
+                updated = AccountManagementService._set_tenant_join_role(tenant_id, account.id, final_role)
+            if not updated:
+                join = AccountManagementService._find_tenant_join(tenant_id, account.id)
 
+            if join:
                 # 更新角色
                 join.role = final_role
                 join.updated_at = datetime.utcnow()
-            else:
+            elif not updated:
                 # 创建新的租户成员关系
-                # 确定角色
-                if role.lower() == 'admin':
-                    final_role = TenantAccountRole.ADMIN
-                else:
-                    final_role = TenantAccountRole.NORMAL
-
                 new_join = TenantAccountJoin(
                     tenant_id=tenant_id,
                     account_id=account.id,
@@ -398,8 +984,19 @@ class AccountManagementService:
                 )
                 db.session.add(new_join)
 
-        # 保存更改
-        db.session.commit()
+        # 保存更改；缓存只写入已提交的值
+        if commit:
+            db.session.commit()
+            if new_email is not None and new_email != email:
+                cache.invalidate([email])
+            if role is not None and tenant_id is not None:
+                cache.put(account.email, account.id, tenant_id, final_role)
+            elif cached is not None:
+                cache.put(account.email, account.id, cached.tenant_id, cached.role)
+            else:
+                cache.put(account.email, account.id)
+        else:
+            db.session.flush()
 
         # 返回更新后的账户信息
         result = {
@@ -420,20 +1017,21 @@ class AccountManagementService:
     @staticmethod
     def delete_account(email: str) -> Dict[str, Any]:
         # 查找账户
-        account = Account.query.filter_by(email=email).first()
+        account = AccountManagementService._load_account(email, get_account_cache().get(email))
         if not account:
             raise AccountNotFoundError(f"Account with email {email} not found")
 
         account_id = account.id
 
         # 查找并删除关联的租户关系
-        tenant_joins = TenantAccountJoin.query.filter_by(account_id=account_id).all()
+        tenant_joins = AccountManagementService._find_account_joins(account_id)
         for join in tenant_joins:
             db.session.delete(join)
 
         # 删除账户
         db.session.delete(account)
         db.session.commit()
+        get_account_cache().invalidate([email])
 
         return {
             'email': email,
@@ -490,6 +1088,7 @@ class AccountManagementService:
         # 保存到数据库
         db.session.add(new_join)
         db.session.commit()
+        get_account_cache().invalidate([account.email])
 
         return {
             'id': new_join.id,
@@ -543,6 +1142,7 @@ class AccountManagementService:
         # 删除租户成员关系
         db.session.delete(join)
         db.session.commit()
+        get_account_cache().invalidate([account.email])
 
         return {
             'tenant_id': tenant_id,
@@ -602,6 +1202,7 @@ class AccountManagementService:
 
         # 保存更改
         db.session.commit()
+        get_account_cache().invalidate([account.email])
 
         return {
             'id': join.id,
@@ -613,18 +1214,23 @@ class AccountManagementService:
 
     @staticmethod
     def get_tenant_members(tenant_id: str) -> List[Dict[str, Any]]:
-        # 检查租户是否存在
-        tenant = Tenant.query.get(tenant_id)
-        if not tenant:
-            raise TenantNotFoundError(f"Tenant with id {tenant_id} not found")
+        # 只读查询，配置了只读副本时从副本读取
+        with read_session() as session:
+            # 检查租户是否存在
+            tenant = session.get(Tenant, tenant_id)
+            if not tenant:
+                raise TenantNotFoundError(f"Tenant with id {tenant_id} not found")
 
-        # 查找租户成员关系
-        joins = TenantAccountJoin.query.filter_by(tenant_id=tenant_id).all()
+            # 一次JOIN查询成员关系及账户
+            rows = session.execute(
+                select(TenantAccountJoin, Account)
+                .join(Account, Account.id == TenantAccountJoin.account_id)
+                .where(TenantAccountJoin.tenant_id == tenant_id)
+            ).all()
 
         # 构建成员列表
         members = []
-        for join in joins:
-            account = Account.query.get(join.account_id)
+        for join, account in rows:
             if account:
                 members.append({
                     'id': join.id,
@@ -0,0 +1,125 @@
+import math
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from .database_config import DatabaseConfig
+
+# 操作类型到限流分组的映射，未列出的操作使用 default 分组
+OPERATION_GROUPS = {
+    "sync": "sync",
+    "models": "models",
+    "get": "get",
+    "changes_since": "get",
+    "search": "get",
+    "diagnostics": "diagnostics",
+    "account_create": "account",
+    "account_update": "account",
+    "account_delete": "account",
+}
+
+
+# 异常类定义
+class AdmissionRejectedError(Exception):
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class OperationLimiter:
+    """单个分组的并发上限 + 有界等待队列 + 排队超时"""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.Semaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.queue_timeout))
+
+    @contextmanager
+    def admit(self):
+        with self._lock:
+            acquired = self._slots.acquire(blocking=False)
+            if not acquired:
+                if self.waiting >= self.max_queue:
+                    self.rejected += 1
+                    raise AdmissionRejectedError(
+                        f"Too many concurrent {self.name} operations", self.retry_after
+                    )
+                self.waiting += 1
+
+        if not acquired:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+            with self._lock:
+                self.waiting -= 1
+                if not acquired:
+                    self.timed_out += 1
+            if not acquired:
+                raise AdmissionRejectedError(
+                    f"Timed out waiting for a {self.name} slot", self.retry_after
+                )
+
+        with self._lock:
+            self.active += 1
+            self.admitted += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "active": self.active,
+                "queue_depth": self.waiting,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+
+
+_limiters: Dict[str, OperationLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(operation_type: Optional[str]) -> OperationLimiter:
+    group = OPERATION_GROUPS.get(operation_type, "default")
+    limiter = _limiters.get(group)
+    if limiter is not None:
+        return limiter
+    with _limiters_lock:
+        limiter = _limiters.get(group)
+        if limiter is None:
+            config = DatabaseConfig()
+            limits = config.ADMISSION_MAX_CONCURRENCY
+            limiter = OperationLimiter(
+                group,
+                limits.get(group, limits.get("default", 8)),
+                config.ADMISSION_MAX_QUEUE,
+                config.ADMISSION_QUEUE_TIMEOUT,
+            )
+            _limiters[group] = limiter
+    return limiter
+
+
+def admit(operation_type: Optional[str]):
+    """获取操作类型对应分组的执行槽位，饱和时抛出 AdmissionRejectedError"""
+    return get_limiter(operation_type).admit()
+
+
+def admission_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: limiter.stats() for name, limiter in list(_limiters.items())}
@@ -0,0 +1,273 @@
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Mapping
+
+from sqlalchemy import bindparam, delete, insert, select, update
+import logging
+from dify_plugin.config.logger_format import plugin_logger_handler
+
+from .database_config import DatabaseConfig
+from .account_cache import get_account_cache
+from .account_management import (
+    Account,
+    AccountManagementService,
+    BULK_LOOKUP_CHUNK_SIZE,
+    Tenant,
+    TenantAccountJoin,
+    TenantNotFoundError,
+    generate_password_fields,
+)
+from .bulk_loader import iter_chunks
+from .retry import run_with_retry
+from .model_management import (
+    ProviderModel,
+    ProviderModelCredential,
+    TAIDESK_CREDENTIAL_NAME,
+    TAIDESK_PROVIDER_NAME,
+    build_encrypted_config,
+)
+from .payload_schemas import dedupe_sync_accounts, parse_sync_accounts, parse_sync_models
+
+# 使用自定义处理器设置日志
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(plugin_logger_handler)
+
+# 异步写入时每个流水线分块的记录数
+ASYNC_WRITE_CHUNK_SIZE = 500
+
+
+@asynccontextmanager
+async def async_engine_scope():
+    """
+    创建本次调用使用的 SQLAlchemy asyncio 引擎，退出时释放连接池。
+    asyncpg连接绑定在事件循环上，每个 asyncio.run 都有独立的循环，因此引擎不能跨请求复用；
+    连接池固定为 SQLALCHEMY_ASYNC_POOL_SIZE 且不允许溢出，避免在同步连接池之外再占用大量连接。
+    """
+    try:
+        from sqlalchemy.ext.asyncio import create_async_engine
+    except ImportError as e:
+        raise RuntimeError("SQLALCHEMY_ASYNC_ENABLED requires sqlalchemy[asyncio] and an async driver (asyncpg)") from e
+
+    config = DatabaseConfig()
+    database_uri = config.SQLALCHEMY_ASYNC_DATABASE_URI
+    if '_plugin' in database_uri:
+        database_uri = database_uri.replace('_plugin', '')
+    engine = create_async_engine(
+        database_uri,
+        pool_size=config.SQLALCHEMY_ASYNC_POOL_SIZE,
+        max_overflow=0,
+    )
+    try:
+        yield engine
+    finally:
+        await engine.dispose()
+
+
+def run_async(coroutine_function, *args):
+    """
+    在独立事件循环中运行异步服务方法。
+    异步路径在一个事务中写入整个批次，失败时整体回滚，因此瞬时错误按整个调用重试。
+    """
+    async def runner():
+        async with async_engine_scope() as engine:
+            return await coroutine_function(engine, *args)
+
+    return run_with_retry(lambda: asyncio.run(runner()), description="异步同步")
+
+
+async def _fetch_first_tenant_id(engine) -> str:
+    async with engine.connect() as conn:
+        tenant_id = (await conn.execute(select(Tenant.__table__.c.id).limit(1))).scalar()
+    return tenant_id
+
+
+async def _gather_chunked(engine, keys: List[Any], fetch_chunk) -> List[Any]:
+    """将键分块后在多个连接上并发查询，并发数受连接池大小限制"""
+    semaphore = asyncio.Semaphore(max(engine.pool.size(), 1))
+
+    async def run(chunk):
+        async with semaphore:
+            async with engine.connect() as conn:
+                return (await conn.execute(fetch_chunk(chunk))).all()
+
+    chunk_rows = await asyncio.gather(*(run(chunk) for chunk in iter_chunks(keys, BULK_LOOKUP_CHUNK_SIZE)))
+    return [row for rows in chunk_rows for row in rows]
+
+
+class AsyncAccountManagementService:
+    @staticmethod
+    async def sync_accounts(engine, sync_data) -> List[Dict[str, Any]]:
+        """
+        同步账户数据（asyncio引擎）
+        租户与已存在账户的查询并发执行；新账户按分块流水线写入，下一块的密码计算与当前块的写入重叠
+        :param engine: AsyncEngine
+        :param sync_data: 同步数据列表（原始字典或已校验的SyncAccountRecord）
+        :return: 同步结果
+        """
+        records = parse_sync_accounts(sync_data)
+        records, results = dedupe_sync_accounts(records)
+        account_table = Account.__table__
+        join_table = TenantAccountJoin.__table__
+
+        # 独立的读操作并发执行
+        tenant_id, existing_rows = await asyncio.gather(
+            _fetch_first_tenant_id(engine),
+            _gather_chunked(
+                engine,
+                [record.email for record in records],
+                lambda chunk: select(account_table.c.id, account_table.c.email, account_table.c.name)
+                .where(account_table.c.email.in_(chunk)),
+            ),
+        )
+        if not tenant_id:
+            raise TenantNotFoundError("数据库中未找到租户信息")
+        existing = {email: (account_id, name) for account_id, email, name in existing_rows}
+        role_rows = await _gather_chunked(
+            engine,
+            [value[0] for value in existing.values()],
+            lambda chunk: select(join_table.c.account_id, join_table.c.role)
+            .where(join_table.c.tenant_id == tenant_id, join_table.c.account_id.in_(chunk)),
+        )
+        current_roles = {account_id: role for account_id, role in role_rows}
+
+        new_records = [record for record in records if record.email not in existing]
+        member_rows = AccountManagementService._build_member_rows(records)
+        now = datetime.utcnow()
+        loop = asyncio.get_running_loop()
+
+        def prepare(chunk):
+            password_fields = [generate_password_fields(record.email) for record in chunk]
+            return AccountManagementService._build_account_rows(chunk, password_fields, now)
+
+        account_ids = {email: value[0] for email, value in existing.items()}
+        async with engine.begin() as conn:
+            # 流水线：写入当前块的同时在线程池中准备下一块
+            chunks = list(iter_chunks(new_records, ASYNC_WRITE_CHUNK_SIZE))
+            pending = loop.run_in_executor(None, prepare, chunks[0]) if chunks else None
+            for index in range(len(chunks)):
+                account_rows = await pending
+                if index + 1 < len(chunks):
+                    pending = loop.run_in_executor(None, prepare, chunks[index + 1])
+                await conn.execute(insert(account_table), account_rows)
+                account_ids.update({row['email']: row['id'] for row in account_rows})
+
+            renamed = [
+                {'b_email': row['email'], 'b_name': row['name']}
+                for row in member_rows
+                if row['email'] in existing and row['name'] is not None and existing[row['email']][1] != row['name']
+            ]
+            if renamed:
+                await conn.execute(
+                    update(account_table)
+                    .where(account_table.c.email == bindparam('b_email'))
+                    .values(name=bindparam('b_name'), updated_at=now),
+                    renamed
+                )
+
+            new_joins, changed_roles = AccountManagementService._diff_memberships(
+                tenant_id, member_rows, account_ids, current_roles, now
+            )
+            for chunk in iter_chunks(new_joins, ASYNC_WRITE_CHUNK_SIZE):
+                await conn.execute(insert(join_table), list(chunk))
+            if changed_roles:
+                await conn.execute(
+                    update(join_table)
+                    .where(join_table.c.tenant_id == tenant_id, join_table.c.account_id == bindparam('b_account_id'))
+                    .values(role=bindparam('b_role'), updated_at=now),
+                    changed_roles
+                )
+        # 批量SQL直接改写了姓名和角色；事务回滚时数据未变，无需清除
+        get_account_cache().invalidate(record.email for record in records)
+
+        for record in records:
+            results.append({
+                "user_id": record.id,
+                "status": "updated" if record.email in existing else "created",
+            })
+        return results
+
+
+class AsyncModelManagementService:
+    @staticmethod
+    async def sync_models(engine, models_data, settings: Mapping) -> List[Dict[str, Any]]:
+        """
+        同步模型数据（asyncio引擎），已存在模型与凭证的查询并发执行
+        """
+        records = parse_sync_models(models_data)
+        api_key = settings.get("api_key")
+        model_table = ProviderModel.__table__
+        credential_table = ProviderModelCredential.__table__
+
+        tenant_id = await _fetch_first_tenant_id(engine)
+        if not tenant_id:
+            raise TenantNotFoundError("dify还没初始化workspace")
+
+        async def fetch(statement):
+            async with engine.connect() as conn:
+                return (await conn.execute(statement)).all()
+
+        existing_models, existing_credentials = await asyncio.gather(
+            fetch(select(model_table.c.id, model_table.c.model_name).where(
+                model_table.c.tenant_id == tenant_id,
+                model_table.c.provider_name == TAIDESK_PROVIDER_NAME,
+            )),
+            fetch(select(credential_table.c.id, credential_table.c.model_name).where(
+                credential_table.c.tenant_id == tenant_id,
+                credential_table.c.provider_name == TAIDESK_PROVIDER_NAME,
+            )),
+        )
+        existing_model_dict = {model_name: model_id for model_id, model_name in existing_models}
+
+        results = []
+        new_credentials = []
+        new_models = []
+        now = datetime.utcnow()
+        for record in records:
+            provider_model_name = record.provider_model_name
+            if existing_model_dict.pop(provider_model_name, None):
+                results.append({"model_id": provider_model_name, "status": "existed"})
+                continue
+            credential_id = str(uuid.uuid4())
+            new_credentials.append({
+                'id': credential_id,
+                'tenant_id': tenant_id,
+                'provider_name': TAIDESK_PROVIDER_NAME,
+                'model_name': provider_model_name,
+                'model_type': record.model_type,
+                'credential_name': TAIDESK_CREDENTIAL_NAME,
+                'encrypted_config': build_encrypted_config(record, api_key),
+                'created_at': now,
+                'updated_at': now,
+            })
+            new_models.append({
+                'id': str(uuid.uuid4()),
+                'tenant_id': tenant_id,
+                'provider_name': TAIDESK_PROVIDER_NAME,
+                'model_name': provider_model_name,
+                'model_type': record.model_type,
+                'credential_id': credential_id,
+                'is_valid': True,
+                'created_at': now,
+                'updated_at': now,
+            })
+            results.append({"model_id": provider_model_name, "status": "created"})
+
+        stale_names = set(existing_model_dict.keys())
+        stale_credential_ids = [
+            credential_id for credential_id, model_name in existing_credentials if model_name in stale_names
+        ]
+        async with engine.begin() as conn:
+            if new_credentials:
+                await conn.execute(insert(credential_table), new_credentials)
+                await conn.execute(insert(model_table), new_models)
+            for chunk in iter_chunks(stale_credential_ids, BULK_LOOKUP_CHUNK_SIZE):
+                await conn.execute(delete(credential_table).where(credential_table.c.id.in_(chunk)))
+            for chunk in iter_chunks(list(existing_model_dict.values()), BULK_LOOKUP_CHUNK_SIZE):
+                await conn.execute(delete(model_table).where(model_table.c.id.in_(chunk)))
+
+        for provider_model_name in existing_model_dict.keys():
+            results.append({"model_id": provider_model_name, "status": "deleted"})
+        return results
@@ -0,0 +1,53 @@
+import csv
+import io
+from typing import Any, Iterable, List, Sequence
+
+from sqlalchemy import Table, insert
+
+# 每次COPY/多行INSERT提交给数据库的行数
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def is_postgres(connection) -> bool:
+    """判断当前连接是否为PostgreSQL"""
+    return connection.dialect.name == "postgresql"
+
+
+def iter_chunks(rows: Sequence[Any], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterable[Sequence[Any]]:
+    for start in range(0, len(rows), chunk_size):
+        yield rows[start:start + chunk_size]
+
+
+def copy_rows(connection, table_name: str, columns: List[str], rows: Sequence[Sequence[Any]],
+              chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    通过 COPY ... FROM STDIN 将行数据分块流式写入PostgreSQL表（通常是临时暂存表）
+    :param connection: SQLAlchemy Connection（必须是psycopg2驱动）
+    :param table_name: 目标表名
+    :param columns: 列名列表，与每行的值一一对应
+    :param rows: 行数据
+    :return: 写入的行数
+    """
+    column_list = ", ".join(columns)
+    sql = f"COPY {table_name} ({column_list}) FROM STDIN WITH (FORMAT csv)"
+    # 取得底层DBAPI连接，与当前事务共用同一个数据库会话
+    dbapi_connection = connection.connection.dbapi_connection
+    total = 0
+    with dbapi_connection.cursor() as cursor:
+        for chunk in iter_chunks(rows, chunk_size):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerows(chunk)
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+            total += len(chunk)
+    return total
+
+
+def insert_rows(connection, table: Table, rows: List[dict], chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """非PostgreSQL后端的回退方案：分块多行INSERT"""
+    total = 0
+    for chunk in iter_chunks(rows, chunk_size):
+        connection.execute(insert(table), list(chunk))
+        total += len(chunk)
+    return total
@@ -0,0 +1,114 @@
+import os
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from .database_config import DatabaseConfig
+
+# 报告中保留的最近决策条数
+MAX_REPORTED_DECISIONS = 50
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> Optional[int]:
+    """当前进程常驻内存（字节）；Linux读取 /proc/self/statm，其他平台退化为峰值RSS"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except (ImportError, OSError, ValueError):
+        return None
+    # macOS以字节为单位，Linux以KB为单位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class AdaptiveChunker:
+    """
+    按内存水位自适应调整块大小：每个块处理完后测量RSS与会话身份映射大小，
+    超过预算的目标比例时减半，预计下一块（按已观测的每条记录内存增量）仍有余量时加倍。
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, budget_bytes: int,
+                 target_fraction: float, identity_map_limit: int):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.size = min(max(initial, self.minimum), self.maximum)
+        self.budget_bytes = budget_bytes
+        self.target_bytes = int(budget_bytes * target_fraction)
+        self.identity_map_limit = identity_map_limit
+        self.decisions: List[Dict[str, Any]] = []
+        self.peak_rss: Optional[int] = None
+        self._bytes_per_record = 0.0
+
+    @classmethod
+    def from_config(cls) -> "AdaptiveChunker":
+        config = DatabaseConfig()
+        return cls(
+            config.SYNC_CHUNK_SIZE_INITIAL,
+            config.SYNC_CHUNK_SIZE_MIN,
+            config.SYNC_CHUNK_SIZE_MAX,
+            config.MEMORY_BUDGET_BYTES,
+            config.MEMORY_TARGET_FRACTION,
+            config.SYNC_IDENTITY_MAP_LIMIT,
+        )
+
+    def chunks(self, items: Sequence[Any], session=None) -> Iterator[Sequence[Any]]:
+        """按当前块大小切分 items；每个块被处理完（生成器恢复）后根据内存情况调整下一块的大小"""
+        position = 0
+        while position < len(items):
+            size = self.size
+            chunk = items[position:position + size]
+            rss_before = current_rss()
+            yield chunk
+            position += len(chunk)
+            self._adjust(len(chunk), rss_before, current_rss(), len(session.identity_map) if session else 0)
+
+    def _adjust(self, processed: int, rss_before: Optional[int], rss_after: Optional[int], identity_map_size: int) -> None:
+        previous = self.size
+        if rss_after is None:
+            action = "hold"
+        else:
+            self.peak_rss = max(self.peak_rss or 0, rss_after)
+            if rss_before is not None and processed and rss_after > rss_before:
+                # 每条记录的内存增量取观测的最大值，偏保守
+                self._bytes_per_record = max(self._bytes_per_record, (rss_after - rss_before) / processed)
+            projected = rss_after + self._bytes_per_record * previous * 2
+            if rss_after >= self.target_bytes or identity_map_size > self.identity_map_limit:
+                self.size = max(self.minimum, previous // 2)
+                action = "shrink"
+            elif projected < self.target_bytes and identity_map_size * 2 <= self.identity_map_limit:
+                self.size = min(self.maximum, previous * 2)
+                action = "grow"
+            else:
+                action = "hold"
+            if self.size == previous:
+                action = "hold"
+        self.decisions.append({
+            "chunk": len(self.decisions),
+            "size": processed,
+            "next_size": self.size,
+            "rss_mb": round(rss_after / 1048576, 1) if rss_after is not None else None,
+            "identity_map": identity_map_size,
+            "action": action,
+        })
+
+    @property
+    def chunked(self) -> bool:
+        """批次是否被切成了多个块；只有一个块时没有可报告的自适应决策"""
+        return len(self.decisions) > 1
+
+    def report(self) -> Dict[str, Any]:
+        sizes = [decision["size"] for decision in self.decisions]
+        return {
+            "chunks": len(self.decisions),
+            "min_size": min(sizes) if sizes else None,
+            "max_size": max(sizes) if sizes else None,
+            "final_size": self.size,
+            "peak_rss_mb": round(self.peak_rss / 1048576, 1) if self.peak_rss is not None else None,
+            "target_mb": round(self.target_bytes / 1048576, 1),
+            "decisions": self.decisions[-MAX_REPORTED_DECISIONS:],
+        }
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from sqlalchemy import select
+
+from .account_management import Account
+
+# 导出的账户列，与 get 操作的JSON字段一致
+EXPORT_COLUMNS = (
+    "id", "email", "name", "interface_language", "interface_theme",
+    "timezone", "status", "created_at", "updated_at",
+)
+TIMESTAMP_COLUMNS = frozenset(("created_at", "updated_at"))
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+Batch = Dict[str, List[Any]]
+
+
+# 异常类定义
+class ExportFormatError(Exception):
+    pass
+
+
+def iter_account_batches(connection, batch_size: int) -> Iterator[Batch]:
+    """
+    按列投影查询账户表，服务端游标分批读取，每批转置为 列名 -> 值列表。
+    不经过ORM实体和身份映射，内存占用只与批大小相关。
+    connection 由调用方持有到生成器消费完为止，与计算校验值的查询处于同一事务（快照）中。
+    """
+    table = Account.__table__
+    statement = select(*(table.c[name] for name in EXPORT_COLUMNS))
+    result = connection.execution_options(stream_results=True, yield_per=batch_size).execute(statement)
+    for rows in result.partitions():
+        columns = dict(zip(EXPORT_COLUMNS, map(list, zip(*rows))))
+        columns["id"] = [str(value) for value in columns["id"]]
+        yield columns
+
+
+def _to_microseconds(value: datetime) -> Any:
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None) - value.utcoffset()
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def msgpack_stream(batches: Iterator[Batch]) -> Iterator[bytes]:
+    """
+    MessagePack列批次流：先输出一个头部对象，之后每批一个对象：
+    {"rows": n, "columns": {列名: [值, ...]}}
+    时间列为UTC微秒时间戳（int64），可直接构造 datetime64[us] 列。
+    """
+    import msgpack
+
+    packer = msgpack.Packer()
+    yield packer.pack({
+        "format": "taidesk-columns",
+        "version": 1,
+        "columns": list(EXPORT_COLUMNS),
+        "timestamp_unit": "us",
+    })
+    for batch in batches:
+        rows = len(batch["id"])
+        for name in TIMESTAMP_COLUMNS:
+            batch[name] = [_to_microseconds(value) for value in batch[name]]
+        yield packer.pack({"rows": rows, "columns": batch})
+
+
+class _ChunkSink:
+    """收集Arrow写出的字节，每批写完后取出并清空"""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def arrow_stream(batches: Iterator[Batch]) -> Iterator[bytes]:
+    """Arrow IPC流格式：schema消息后每批一个RecordBatch，可被 pyarrow.ipc.open_stream 零拷贝读取"""
+    import pyarrow as pa
+
+    schema = pa.schema([
+        pa.field(name, pa.timestamp("us") if name in TIMESTAMP_COLUMNS else pa.string())
+        for name in EXPORT_COLUMNS
+    ])
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema) as writer:
+        yield sink.drain()
+        for batch in batches:
+            writer.write_batch(pa.RecordBatch.from_pydict(batch, schema=schema))
+            yield sink.drain()
+    tail = sink.drain()
+    if tail:
+        yield tail
+
+
+# 导出格式 -> (依赖包, Content-Type, 编码函数)
+EXPORT_FORMATS: Dict[str, Tuple[str, str, Callable[[Iterator[Batch]], Iterator[bytes]]]] = {
+    "arrow": ("pyarrow", "application/vnd.apache.arrow.stream", arrow_stream),
+    "msgpack": ("msgpack", "application/x-msgpack", msgpack_stream),
+}
+
+
+def get_export_format(name: str) -> Tuple[str, Callable[[Iterator[Batch]], Iterator[bytes]]]:
+    """校验导出格式及其可选依赖，返回 (Content-Type, 编码函数)"""
+    if name not in EXPORT_FORMATS:
+        raise ExportFormatError(
+            f"Unsupported export format: {name}; expected one of {', '.join(EXPORT_FORMATS)}"
+        )
+    package, content_type, encoder = EXPORT_FORMATS[name]
+    try:
+        __import__(package)
+    except ImportError:
+        raise ExportFormatError(f"Export format {name} requires the {package} package")
+    return content_type, encoder
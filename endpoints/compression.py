@@ -0,0 +1,189 @@
+import io
+import json
+import zlib
+from typing import Any, Iterable, Iterator, Optional
+
+from werkzeug import Request, Response
+
+from .database_config import DatabaseConfig
+
+# 每次读取/压缩的块大小
+CHUNK_SIZE = 64 * 1024
+# 小于该大小的响应不压缩
+MIN_COMPRESS_SIZE = 1024
+# zstd的decompressobj不能限制单次输出：每次只送入少量输入，单次输出最多约为若干个128KB的块，
+# 解压后的大小在每次调用后检查
+ZSTD_INPUT_SIZE = 256
+
+
+# 异常类定义
+class UnsupportedEncodingError(Exception):
+    pass
+
+
+class RequestBodyTooLargeError(Exception):
+    pass
+
+
+class CorruptRequestBodyError(Exception):
+    pass
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def supported_encodings() -> list:
+    # 按优先级排列
+    return (["zstd"] if _zstandard() is not None else []) + ["gzip"]
+
+
+def _decompressing_reader(stream, encoding: str):
+    if encoding == "gzip":
+        return io.BufferedReader(_DecompressingStreamReader(stream, zlib.decompressobj(wbits=31), encoding))
+    if encoding == "zstd":
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise UnsupportedEncodingError("zstd request bodies require the zstandard package")
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        return io.BufferedReader(
+            _DecompressingStreamReader(stream, decompressor, encoding, read_size=ZSTD_INPUT_SIZE, max_output=None)
+        )
+    raise UnsupportedEncodingError(f"Unsupported Content-Encoding: {encoding}")
+
+
+class _DecompressingStreamReader(io.RawIOBase):
+    """
+    基于 decompressobj 的流式解压，避免一次性读入整个压缩体；
+    输入读完时压缩流还没有结束（eof为False）说明请求体被截断
+    """
+
+    def __init__(self, stream, decompressor, encoding: str, read_size: int = CHUNK_SIZE,
+                 max_output: Optional[int] = CHUNK_SIZE):
+        self._stream = stream
+        self._decompressor = decompressor
+        self._encoding = encoding
+        self._read_size = read_size
+        self._max_output = max_output
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def _decompress(self, chunk: bytes) -> bytes:
+        if self._max_output is None:
+            return self._decompressor.decompress(chunk)
+        # 限制单次解压输出，未消费的输入留在unconsumed_tail中
+        return self._decompressor.decompress(chunk, self._max_output)
+
+    def readinto(self, target) -> int:
+        while not self._buffer:
+            chunk = getattr(self._decompressor, "unconsumed_tail", b"") or self._stream.read(self._read_size)
+            if not chunk:
+                self._buffer = self._decompressor.flush()
+                if not self._buffer and not self._decompressor.eof:
+                    raise CorruptRequestBodyError(f"Request body is not valid {self._encoding} data: truncated stream")
+                break
+            self._buffer = self._decompress(chunk)
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def read_json_body(r: Request) -> Any:
+    """
+    读取JSON请求体，支持 Content-Encoding: gzip / zstd 的流式解压。
+    解压后的大小受 MAX_REQUEST_BODY_BYTES 限制，防止压缩炸弹撑爆插件内存。
+    未压缩的请求体解析失败时返回None，与 get_json(silent=True) 行为一致；
+    压缩的请求体解压失败、被截断或解压后不是JSON时抛出 CorruptRequestBodyError。
+    """
+    encoding = (r.headers.get("Content-Encoding") or "identity").strip().lower()
+    if encoding == "identity":
+        return r.get_json(silent=True)
+
+    limit = DatabaseConfig().MAX_REQUEST_BODY_BYTES
+    reader = _decompressing_reader(r.stream, encoding)
+    zstandard = _zstandard()
+    decompression_errors = (zlib.error,) + ((zstandard.ZstdError,) if zstandard is not None else ())
+    buffer = bytearray()
+    while True:
+        try:
+            chunk = reader.read(CHUNK_SIZE)
+        except decompression_errors as e:
+            raise CorruptRequestBodyError(f"Request body is not valid {encoding} data: {str(e)}") from None
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > limit:
+            raise RequestBodyTooLargeError(f"Decompressed request body exceeds {limit} bytes")
+    try:
+        return json.loads(buffer)
+    except ValueError as e:
+        raise CorruptRequestBodyError(f"Decompressed request body is not valid JSON: {str(e)}") from None
+
+
+def negotiate_encoding(r: Request) -> Optional[str]:
+    """根据 Accept-Encoding 选择响应压缩算法"""
+    return r.accept_encodings.best_match(supported_encodings())
+
+
+def _split(data: bytes) -> Iterator[memoryview]:
+    view = memoryview(data)
+    for start in range(0, len(view), CHUNK_SIZE):
+        yield view[start:start + CHUNK_SIZE]
+
+
+def _compress_chunks(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    if encoding == "zstd":
+        compressor = _zstandard().ZstdCompressor(level=3).compressobj()
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    try:
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        tail = compressor.flush()
+        if tail:
+            yield tail
+    finally:
+        # 提前结束时关闭原始响应体，释放其持有的连接等资源
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def compress_response(r: Request, response: Response) -> Response:
+    """
+    按 Accept-Encoding 将响应体改为分块流式压缩输出。
+    流式响应（列式导出）逐块压缩，不把整个响应体读入内存。
+    """
+    if response.status_code < 200 or response.status_code in (204, 304):
+        return response
+    if "Content-Encoding" in response.headers:
+        return response
+    response.vary.add("Accept-Encoding")
+    if response.is_streamed:
+        chunks = response.response
+    else:
+        data = response.get_data()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return response
+        chunks = _split(data)
+    encoding = negotiate_encoding(r)
+    if not encoding:
+        return response
+
+    compressed = Response(
+        response=_compress_chunks(chunks, encoding),
+        status=response.status_code,
+        headers=response.headers,
+    )
+    compressed.headers["Content-Encoding"] = encoding
+    compressed.headers.pop("Content-Length", None)
+    return compressed
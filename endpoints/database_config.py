@@ -1,4 +1,6 @@
-from pydantic import Field, computed_field, PositiveInt, NonNegativeInt
+from typing import Dict, Literal, Optional
+
+from pydantic import Field, computed_field, PositiveInt, NonNegativeInt, NonNegativeFloat
 from pydantic_settings import BaseSettings,SettingsConfigDict
 from urllib.parse import quote_plus
 
@@ -51,18 +53,46 @@ class DatabaseConfig(BaseSettings):
         default="postgresql",
     )
 
-    @computed_field
-    def SQLALCHEMY_DATABASE_URI(self) -> str:
-        db_extras = (
-            f"{self.DB_EXTRAS}&client_encoding={self.DB_CHARSET}" if self.DB_CHARSET else self.DB_EXTRAS
-        ).strip("&")
+    def _build_database_uri(self, scheme: str, with_extras: bool = True) -> str:
+        db_extras = ""
+        if with_extras:
+            db_extras = (
+                f"{self.DB_EXTRAS}&client_encoding={self.DB_CHARSET}" if self.DB_CHARSET else self.DB_EXTRAS
+            ).strip("&")
         db_extras = f"?{db_extras}" if db_extras else ""
         return (
-            f"{self.SQLALCHEMY_DATABASE_URI_SCHEME}://"
+            f"{scheme}://"
             f"{quote_plus(self.DB_USERNAME)}:{quote_plus(self.DB_PASSWORD)}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_DATABASE}"
             f"{db_extras}"
         )
 
+    @computed_field
+    def SQLALCHEMY_DATABASE_URI(self) -> str:
+        return self._build_database_uri(self.SQLALCHEMY_DATABASE_URI_SCHEME)
+
+    SQLALCHEMY_ASYNC_ENABLED: bool = Field(
+        description="Run the sync and models operations on the SQLAlchemy asyncio engine instead of Flask-SQLAlchemy. "
+                    "The async path writes the whole batch in one transaction: a deadlock or serialization failure "
+                    "retries the whole call, and the memory-adaptive SYNC_CHUNK_SIZE_* chunking does not apply (fixed write chunks).",
+        default=False,
+    )
+
+    SQLALCHEMY_ASYNC_POOL_SIZE: PositiveInt = Field(
+        description="Connections each async sync/models call may open (no overflow); also bounds its concurrent lookups. "
+                    "These are in addition to the Flask-SQLAlchemy pool.",
+        default=4,
+    )
+
+    SQLALCHEMY_ASYNC_DATABASE_URI_SCHEME: str = Field(
+        description="Database URI scheme for the SQLAlchemy asyncio engine.",
+        default="postgresql+asyncpg",
+    )
+
+    @computed_field
+    def SQLALCHEMY_ASYNC_DATABASE_URI(self) -> str:
+        # asyncpg不识别libpq风格的DB_EXTRAS参数，因此不拼接
+        return self._build_database_uri(self.SQLALCHEMY_ASYNC_DATABASE_URI_SCHEME, with_extras=False)
+
     SQLALCHEMY_POOL_SIZE: NonNegativeInt = Field(
         description="Maximum number of database connections in the pool.",
         default=30,
@@ -71,4 +101,193 @@ class DatabaseConfig(BaseSettings):
     SQLALCHEMY_MAX_OVERFLOW: NonNegativeInt = Field(
         description="Maximum number of connections that can be created beyond the pool_size.",
         default=10,
+    )
+
+    SQLALCHEMY_REPLICA_DATABASE_URI: Optional[str] = Field(
+        description="Optional read-replica URI. When set, the get listing/export and tenant member lookups read from it.",
+        default=None,
+    )
+
+    SQLALCHEMY_REPLICA_POOL_SIZE: NonNegativeInt = Field(
+        description="Maximum number of connections in the read-replica pool.",
+        default=10,
+    )
+
+    REPLICA_MAX_LAG_SECONDS: NonNegativeFloat = Field(
+        description="Replication lag above which reads fall back to the primary.",
+        default=30,
+    )
+
+    REPLICA_HEALTH_CHECK_INTERVAL: NonNegativeFloat = Field(
+        description="Seconds between read-replica reachability/lag checks.",
+        default=10,
+    )
+
+    SYNC_CONCURRENCY_POLICY: Literal["wait", "coalesce", "reject"] = Field(
+        description="How an overlapping sync/models call for the same tenant is handled: "
+                    "wait for the running one, coalesce onto its result (only when the payload is identical, otherwise wait), "
+                    "or reject with 409.",
+        default="wait",
+    )
+
+    SYNC_LOCK_TIMEOUT: NonNegativeFloat = Field(
+        description="Maximum seconds an overlapping sync/models call waits before giving up with 409.",
+        default=300,
+    )
+
+    SYNC_MAX_PARTITIONS: PositiveInt = Field(
+        description="Upper bound on the partitions of a partitioned sync; it is further capped at half of "
+                    "SQLALCHEMY_POOL_SIZE so concurrent requests keep connections available.",
+        default=8,
+    )
+
+    DB_RETRY_MAX_ATTEMPTS: PositiveInt = Field(
+        description="Attempts per sync chunk/partition when it fails with a deadlock or serialization failure.",
+        default=4,
+    )
+
+    DB_RETRY_BASE_DELAY: NonNegativeFloat = Field(
+        description="Base delay in seconds of the jittered exponential backoff between chunk retries.",
+        default=0.05,
+    )
+
+    DB_RETRY_MAX_DELAY: NonNegativeFloat = Field(
+        description="Maximum delay in seconds between chunk retries.",
+        default=2.0,
+    )
+
+    ADMISSION_MAX_CONCURRENCY: Dict[str, PositiveInt] = Field(
+        description="Concurrent executions allowed per operation group (sync, models, get, account, diagnostics, default). "
+                    "Example: '{\"sync\": 1, \"account\": 16}'",
+        default={"sync": 2, "models": 2, "get": 4, "account": 8, "diagnostics": 2, "default": 8},
+    )
+
+    ADMISSION_MAX_QUEUE: NonNegativeInt = Field(
+        description="Requests allowed to wait for a slot per operation group before answering 429.",
+        default=16,
+    )
+
+    ADMISSION_QUEUE_TIMEOUT: NonNegativeFloat = Field(
+        description="Maximum seconds a queued request waits for a slot before answering 429.",
+        default=10,
+    )
+
+    LISTING_CACHE_MAX_BYTES: NonNegativeInt = Field(
+        description="Bytes of serialized account listings kept in memory, keyed by their ETag. 0 disables the cache.",
+        default=16 * 1024 * 1024,
+    )
+
+    SLOW_QUERY_LOG_ENABLED: bool = Field(
+        description="Record statements slower than SLOW_QUERY_THRESHOLD_MS; read them with the diagnostics operation.",
+        default=False,
+    )
+
+    SLOW_QUERY_THRESHOLD_MS: NonNegativeFloat = Field(
+        description="Duration in milliseconds above which a statement is recorded by the slow-query log.",
+        default=500,
+    )
+
+    SLOW_QUERY_LOG_SIZE: PositiveInt = Field(
+        description="Number of most recent slow statements kept in memory.",
+        default=100,
+    )
+
+    SLOW_QUERY_EXPLAIN: bool = Field(
+        description="Attach an EXPLAIN (FORMAT JSON) plan to recorded statements (PostgreSQL/psycopg2 only).",
+        default=True,
+    )
+
+    PROFILE_STORE_SIZE: PositiveInt = Field(
+        description="Number of most recent request profiles (profile=true with a matching X-Api-Key) kept in memory.",
+        default=20,
+    )
+
+    PROFILE_TOP_N: PositiveInt = Field(
+        description="Functions (by cumulative time) and allocation sites kept per request profile.",
+        default=30,
+    )
+
+    MEMORY_BUDGET_BYTES: PositiveInt = Field(
+        description="Memory available to the plugin process; should match resource.memory in manifest.yaml.",
+        default=256 * 1024 * 1024,
+    )
+
+    MEMORY_TARGET_FRACTION: float = Field(
+        description="Fraction of MEMORY_BUDGET_BYTES the adaptive sync chunking tries to keep RSS under.",
+        default=0.7,
+        gt=0,
+        le=1,
+    )
+
+    SYNC_CHUNK_SIZE_INITIAL: PositiveInt = Field(
+        description="Records in the first chunk of sync/models; later chunks grow or shrink with memory use.",
+        default=200,
+    )
+
+    SYNC_CHUNK_SIZE_MIN: PositiveInt = Field(
+        description="Lower bound of the adaptive sync chunk size.",
+        default=20,
+    )
+
+    SYNC_CHUNK_SIZE_MAX: PositiveInt = Field(
+        description="Upper bound of the adaptive sync chunk size.",
+        default=2000,
+    )
+
+    SYNC_IDENTITY_MAP_LIMIT: PositiveInt = Field(
+        description="ORM session identity-map size above which the adaptive sync chunk size shrinks.",
+        default=20000,
+    )
+
+    ACCOUNT_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum entries in the per-process email -> (account id, role) cache used by per-user operations; 0 disables it.",
+        default=10000,
+    )
+
+    ACCOUNT_CACHE_TTL_SECONDS: NonNegativeFloat = Field(
+        description="Seconds an account cache entry is trusted; bounds staleness from writes made outside this plugin process.",
+        default=60,
+    )
+
+    ACCOUNT_UPDATE_WRITE_BEHIND: bool = Field(
+        description="Queue account_update requests and merge updates to the same email within a short window; "
+                    "a background worker commits them in batches. Requests with durable=true still commit before responding.",
+        default=False,
+    )
+
+    ACCOUNT_UPDATE_COALESCE_WINDOW: NonNegativeFloat = Field(
+        description="Seconds a queued account update waits for further updates to the same email before it is flushed.",
+        default=0.5,
+    )
+
+    ACCOUNT_UPDATE_FLUSH_BATCH_SIZE: PositiveInt = Field(
+        description="Maximum queued account updates committed in one transaction by the background flusher.",
+        default=200,
+    )
+
+    ACCOUNT_UPDATE_MAX_PENDING: PositiveInt = Field(
+        description="Maximum emails with queued updates; further account_update requests are written synchronously.",
+        default=10000,
+    )
+
+    INDEX_BOOTSTRAP: Literal["off", "report", "create"] = Field(
+        description="On first use, reflect the indexes the plugin's queries rely on: 'report' logs missing ones, "
+                    "'create' also builds them (CREATE INDEX CONCURRENTLY on PostgreSQL).",
+        default="report",
+    )
+
+    INDEX_CREATE_EXTENSIONS: bool = Field(
+        description="Allow index creation to run CREATE EXTENSION for extensions it relies on (pg_trgm for substring "
+                    "search). Off by default: a missing extension is reported and the prefix-only fallback index is used.",
+        default=False,
+    )
+
+    EXPORT_BATCH_SIZE: PositiveInt = Field(
+        description="Rows fetched from the server-side cursor and emitted per batch by columnar (arrow/msgpack) account exports.",
+        default=10000,
+    )
+
+    MAX_REQUEST_BODY_BYTES: PositiveInt = Field(
+        description="Maximum size of a decompressed (gzip/zstd) request body.",
+        default=128 * 1024 * 1024,
     )
\ No newline at end of file
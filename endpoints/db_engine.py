@@ -1,6 +1,16 @@
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import MetaData
+from sqlalchemy.orm import Session
 from .database_config import DatabaseConfig
+from .indexes import bootstrap_indexes
+from .query_log import install_slow_query_log
+from .read_replica import ReplicaRouter
 
 POSTGRES_INDEXES_NAMING_CONVENTION = {
     "ix": "%(column_0_label)s_idx",
@@ -14,6 +24,11 @@ metadata = MetaData(naming_convention=POSTGRES_INDEXES_NAMING_CONVENTION)
 
 db = SQLAlchemy(metadata=metadata)
 
+# 只读副本在 SQLALCHEMY_BINDS 中的键；模型本身不声明bind_key，写操作始终走主库
+REPLICA_BIND_KEY = "replica"
+
+_replica_router: Optional[ReplicaRouter] = None
+
 
 def init_db(app):
     """Initialize database with configuration from DatabaseConfig."""
@@ -27,6 +42,81 @@ def init_db(app):
     app.config['SQLALCHEMY_POOL_SIZE'] = config.SQLALCHEMY_POOL_SIZE
     app.config['SQLALCHEMY_MAX_OVERFLOW'] = config.SQLALCHEMY_MAX_OVERFLOW
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Optional read replica for read-only operations, with its own pool
+    global _replica_router
+    if config.SQLALCHEMY_REPLICA_DATABASE_URI:
+        app.config['SQLALCHEMY_BINDS'] = {
+            REPLICA_BIND_KEY: {
+                "url": config.SQLALCHEMY_REPLICA_DATABASE_URI,
+                "pool_size": config.SQLALCHEMY_REPLICA_POOL_SIZE,
+                "max_overflow": config.SQLALCHEMY_MAX_OVERFLOW,
+                "pool_pre_ping": True,
+            }
+        }
+        _replica_router = ReplicaRouter(config.REPLICA_MAX_LAG_SECONDS, config.REPLICA_HEALTH_CHECK_INTERVAL)
     
     # Initialize SQLAlchemy with app
-    db.init_app(app)
\ No newline at end of file
+    db.init_app(app)
+
+
+def read_engine():
+    """
+    Engine for read-only operations (requires an app context): the replica when one is
+    configured, reachable and within REPLICA_MAX_LAG_SECONDS, otherwise the primary.
+    """
+    replica = db.engines.get(REPLICA_BIND_KEY) if _replica_router is not None else None
+    if replica is None:
+        return db.engine
+    return _replica_router.choose(db.engine, replica)
+
+
+@contextmanager
+def read_session():
+    """Short-lived session bound to read_engine(); never used for writes."""
+    session = Session(bind=read_engine(), autoflush=False)
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def replica_stats() -> Dict[str, Any]:
+    if _replica_router is None:
+        return {"configured": False}
+    return _replica_router.stats()
+
+
+_app = None
+_app_lock = threading.Lock()
+
+
+def get_app() -> Flask:
+    """Return the process-wide Flask app, creating it and binding the database on first use."""
+    global _app
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                app = Flask(__name__)
+                init_db(app)
+                install_slow_query_log()
+                _start_index_bootstrap(app)
+                _app = app
+    return _app
+
+
+def _start_index_bootstrap(app) -> None:
+    """Check (and optionally create) the plugin's indexes in the background, per INDEX_BOOTSTRAP."""
+    mode = DatabaseConfig().INDEX_BOOTSTRAP
+    if mode == "off":
+        return
+    with app.app_context():
+        engine = db.engine
+
+    def run():
+        try:
+            bootstrap_indexes(engine, create=mode == "create")
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Index bootstrap failed: {str(e)}")
+
+    threading.Thread(target=run, daemon=True).start()
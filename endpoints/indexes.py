@@ -0,0 +1,253 @@
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import inspect, text
+import logging
+from dify_plugin.config.logger_format import plugin_logger_handler
+
+from .database_config import DatabaseConfig
+
+# 使用自定义处理器设置日志
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(plugin_logger_handler)
+
+# 插件依赖的索引：索引名 -> 定义
+# using/columns 为PostgreSQL专用写法时通过 dialects 限定；requires 为依赖的PostgreSQL扩展
+PLUGIN_INDEXES: Dict[str, Dict[str, Any]] = {
+    "accounts_updated_at_id_idx": {"table": "accounts", "columns": ["updated_at", "id"]},
+    "tenant_account_joins_updated_at_id_idx": {"table": "tenant_account_joins", "columns": ["updated_at", "id"]},
+    "accounts_email_trgm_idx": {
+        "table": "accounts", "columns": ["email gin_trgm_ops"], "using": "gin",
+        "dialects": ("postgresql",), "requires": "pg_trgm", "fallback": "accounts_email_pattern_idx",
+    },
+    "accounts_name_trgm_idx": {
+        "table": "accounts", "columns": ["name gin_trgm_ops"], "using": "gin",
+        "dialects": ("postgresql",), "requires": "pg_trgm", "fallback": "accounts_name_pattern_idx",
+    },
+    # 模型同步与成员关系的热点过滤条件；Dify不同版本不一定自带这些索引
+    "provider_model_credentials_tenant_provider_model_idx": {
+        "table": "provider_model_credentials", "columns": ["tenant_id", "provider_name", "model_name"],
+    },
+    "provider_models_tenant_provider_idx": {
+        "table": "provider_models", "columns": ["tenant_id", "provider_name"],
+    },
+    "tenant_account_joins_account_id_idx": {"table": "tenant_account_joins", "columns": ["account_id"]},
+    "tenant_account_joins_tenant_account_idx": {
+        "table": "tenant_account_joins", "columns": ["tenant_id", "account_id"],
+    },
+    # 没有pg_trgm时的回退：只支持前缀匹配的B-tree索引
+    "accounts_email_pattern_idx": {
+        "table": "accounts", "columns": ["email varchar_pattern_ops"], "dialects": ("postgresql",),
+    },
+    "accounts_name_pattern_idx": {
+        "table": "accounts", "columns": ["name varchar_pattern_ops"], "dialects": ("postgresql",),
+    },
+}
+
+# 表上无效（indisvalid=false）且不在创建中的索引：CREATE INDEX CONCURRENTLY 失败或被中断时留下，
+# 查询不会使用，IF NOT EXISTS 也会把它当作已存在
+POSTGRES_INVALID_INDEXES_SQL = text(
+    "SELECT c.relname FROM pg_index i"
+    " JOIN pg_class c ON c.oid = i.indexrelid"
+    " JOIN pg_class t ON t.oid = i.indrelid"
+    " WHERE t.relname = :table AND pg_table_is_visible(t.oid) AND NOT i.indisvalid"
+    " AND NOT EXISTS (SELECT 1 FROM pg_stat_progress_create_index p WHERE p.index_relid = i.indexrelid)"
+)
+
+_ensured = set()
+_ensured_lock = threading.Lock()
+
+
+def _autocommit(engine):
+    return engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+
+
+def has_extension(engine, extension: str) -> bool:
+    """检查PostgreSQL扩展是否已安装；只检查，不修改数据库"""
+    with engine.connect() as connection:
+        return bool(connection.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = :name"), {"name": extension}
+        ).scalar())
+
+
+def install_extension(engine, extension: str) -> bool:
+    """安装PostgreSQL扩展（需要相应权限），仅在开启 INDEX_CREATE_EXTENSIONS 时由 create_index 调用"""
+    with _autocommit(engine) as connection:
+        try:
+            connection.execute(text(f"CREATE EXTENSION IF NOT EXISTS {extension}"))
+            return True
+        except Exception as e:
+            logger.info(f"PostgreSQL扩展 {extension} 安装失败: {str(e)}")
+            return False
+
+
+def invalid_indexes(connection, table: str) -> Set[str]:
+    """PostgreSQL上表的无效索引名；其他数据库没有这种状态，返回空集合"""
+    if connection.dialect.name != "postgresql":
+        return set()
+    return set(connection.execute(POSTGRES_INVALID_INDEXES_SQL, {"table": table}).scalars())
+
+
+def _drop_invalid_index(connection, table: str, name: str) -> None:
+    if name in invalid_indexes(connection, table):
+        logger.info(f"删除无效索引 {name}")
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def create_index(engine, name: str) -> Optional[str]:
+    """
+    创建插件索引（已存在时跳过），返回实际创建的索引名；当前方言不适用时返回None。
+    PostgreSQL上使用 CREATE INDEX CONCURRENTLY，不阻塞Dify对该表的写入；
+    CONCURRENTLY不能在事务中执行，因此使用AUTOCOMMIT连接。
+    同名的无效索引先删除再重建；本次创建失败留下的无效索引也会删除。
+    """
+    definition = PLUGIN_INDEXES[name]
+    dialect = engine.dialect.name
+    if dialect not in definition.get("dialects", (dialect,)):
+        return None
+    requires = definition.get("requires")
+    if requires and not has_extension(engine, requires) and not (
+        DatabaseConfig().INDEX_CREATE_EXTENSIONS and install_extension(engine, requires)
+    ):
+        logger.info(f"PostgreSQL扩展 {requires} 未安装，{name} 改用回退索引")
+        fallback = definition.get("fallback")
+        return create_index(engine, fallback) if fallback else None
+
+    column_list = ", ".join(definition["columns"])
+    using = f" USING {definition['using']}" if definition.get("using") else ""
+    concurrently = " CONCURRENTLY" if dialect == "postgresql" else ""
+    statement = f"CREATE INDEX{concurrently} IF NOT EXISTS {name} ON {definition['table']}{using} ({column_list})"
+    with _autocommit(engine) as connection:
+        _drop_invalid_index(connection, definition["table"], name)
+        try:
+            connection.execute(text(statement))
+        except Exception:
+            _drop_invalid_index(connection, definition["table"], name)
+            raise
+    logger.info(f"已确保索引 {name} 存在")
+    return name
+
+
+def _create_indexes(engine, names: List[str]) -> None:
+    for name in names:
+        try:
+            create_index(engine, name)
+        except Exception as e:
+            logger.error(f"创建索引 {name} 失败: {str(e)}")
+            # 允许之后的请求再次尝试
+            with _ensured_lock:
+                _ensured.discard(name)
+
+
+def ensure_indexes(engine, names: List[str], background: bool = True) -> None:
+    """
+    每个进程对每个索引只确保一次；创建失败只记录日志，不影响业务查询。
+    大表上建索引耗时较长，默认在后台线程中执行，不阻塞触发它的请求。
+    """
+    with _ensured_lock:
+        pending = [name for name in names if name not in _ensured]
+        _ensured.update(pending)
+    if not pending:
+        return
+    if background:
+        threading.Thread(target=_create_indexes, args=(engine, pending), daemon=True).start()
+    else:
+        _create_indexes(engine, pending)
+
+
+def _is_plain(definition: Dict[str, Any]) -> bool:
+    """只由普通列组成的B-tree索引，可以用已有索引的前导列判断是否被覆盖"""
+    return not definition.get("using") and all(" " not in column for column in definition["columns"])
+
+
+def _existing_indexes(inspector, table: str) -> List[Dict[str, Any]]:
+    """反射表上已有的索引、唯一约束与主键，统一为 {name, columns}"""
+    existing = [
+        {"name": index["name"], "columns": list(index.get("column_names") or [])}
+        for index in inspector.get_indexes(table)
+    ]
+    existing += [
+        {"name": constraint["name"], "columns": list(constraint["column_names"])}
+        for constraint in inspector.get_unique_constraints(table)
+    ]
+    primary_key = inspector.get_pk_constraint(table)
+    if primary_key and primary_key.get("constrained_columns"):
+        existing.append({"name": primary_key.get("name"), "columns": list(primary_key["constrained_columns"])})
+    return existing
+
+
+def check_indexes(engine, names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    通过反射检查插件依赖的索引是否存在，返回每个索引的检查结果：
+    present（同名索引存在）、covered（其他索引的前导列已覆盖这些列）、
+    invalid（同名索引无效，需要重建）、missing、table_missing；
+    无效索引不计入 present/covered，当前方言不适用的索引不出现在结果中。
+    """
+    fallbacks = {definition["fallback"] for definition in PLUGIN_INDEXES.values() if definition.get("fallback")}
+    if names is None:
+        names = [name for name in PLUGIN_INDEXES if name not in fallbacks]
+    dialect = engine.dialect.name
+    inspector = inspect(engine)
+    tables: Dict[str, Optional[List[Dict[str, Any]]]] = {}
+    invalid: Dict[str, Set[str]] = {}
+    report = []
+    for name in names:
+        definition = PLUGIN_INDEXES[name]
+        if dialect not in definition.get("dialects", (dialect,)):
+            continue
+        table = definition["table"]
+        if table not in tables:
+            tables[table] = _existing_indexes(inspector, table) if inspector.has_table(table) else None
+            if tables[table] is not None and dialect == "postgresql":
+                with engine.connect() as connection:
+                    invalid[table] = invalid_indexes(connection, table)
+                tables[table] = [index for index in tables[table] if index["name"] not in invalid[table]]
+        existing = tables[table]
+        entry = {"name": name, "table": table, "columns": definition["columns"]}
+        if existing is None:
+            entry["status"] = "table_missing"
+        elif name in invalid.get(table, ()):
+            entry["status"] = "invalid"
+        else:
+            acceptable = {name, definition.get("fallback")} - {None}
+            same_name = next((index["name"] for index in existing if index["name"] in acceptable), None)
+            covering = None
+            if not same_name and _is_plain(definition):
+                columns = definition["columns"]
+                covering = next(
+                    (index["name"] for index in existing if index["columns"][:len(columns)] == columns), None
+                )
+            if same_name:
+                entry["status"] = "present"
+                entry["index"] = same_name
+            elif covering:
+                entry["status"] = "covered"
+                entry["index"] = covering
+            else:
+                entry["status"] = "missing"
+        report.append(entry)
+    return report
+
+
+def bootstrap_indexes(engine, create: bool = False) -> List[Dict[str, Any]]:
+    """
+    检查插件依赖的索引并记录缺失项；create=True 时创建缺失的索引
+    （PostgreSQL上为 CREATE INDEX CONCURRENTLY，不阻塞写入）。
+    """
+    report = check_indexes(engine)
+    for entry in report:
+        if entry["status"] not in ("missing", "invalid"):
+            continue
+        logger.info(f"缺少索引 {entry['name']} ON {entry['table']} ({', '.join(entry['columns'])})")
+        if not create:
+            continue
+        try:
+            created = create_index(engine, entry["name"])
+            if created:
+                entry["status"] = "created"
+                entry["index"] = created
+        except Exception as e:
+            entry["error"] = str(e)
+            logger.error(f"创建索引 {entry['name']} 失败: {str(e)}")
+    return report
@@ -3,12 +3,15 @@ import json
 from datetime import datetime
 from typing import Optional, List, Dict, Any, Mapping
 
-from sqlalchemy import func
+from sqlalchemy import func, select
 import logging
 from dify_plugin.config.logger_format import plugin_logger_handler
 
 from .db_engine import db
 from .account_management import Tenant, TenantNotFoundError
+from .chunking import AdaptiveChunker
+from .retry import run_with_retry
+from .payload_schemas import parse_sync_models
 
 # 使用自定义处理器设置日志
 logger = logging.getLogger(__name__)
@@ -47,124 +50,44 @@ class ProviderModelCredential(db.Model):
     def __repr__(self):
         return f'<ProviderModelCredential(model_name={self.model_name})>'
 
+TAIDESK_PROVIDER_NAME = "thclouds/taimodel/taimodel"
+TAIDESK_CREDENTIAL_NAME = "taidesk_credential"
+
+
+def build_encrypted_config(record, api_key: Optional[str]) -> str:
+    """构造模型凭证的配置JSON"""
+    return json.dumps({
+        "display_name": record.name,
+        "endpoint_model_name": record.provider_model_name,
+        "api_key": api_key,
+        "endpoint_url": "https://www.taidesk.com/compatible-mode/v1",
+        "mode": "chat",
+        "agent_though_support": record.though_support,
+        "vision_support": str(record.vision).lower(),
+        "function_call_support": str(record.functioncall).lower()
+    })
+
 # 服务类实现
 class ModelManagementService:
     @staticmethod
-    def sync_models(models_data, settings: Mapping):
+    def sync_models(models_data, settings: Mapping, chunker: Optional[AdaptiveChunker] = None):
         """
         同步模型数据
+        :param chunker: 自适应分块器，新模型按块flush，块大小随内存水位调整；不传时使用配置创建
         """
-        results = []
+        # 在进入数据库事务之前完成整批校验
+        records = parse_sync_models(models_data)
         api_key = settings.get("api_key")
+        chunker = chunker or AdaptiveChunker.from_config()
         try:
             db.session.begin()
-            first_tenant = Tenant.query.first()
-            if not first_tenant:
-                raise TenantNotFoundError("dify还没初始化workspace")
-            tenant_id = first_tenant.id
-            # provider_name = f"{tenant_id}/taimodel/taimodel"
-            provider_name = "thclouds/taimodel/taimodel"
-            
-            # 查询数据库中该提供商的所有模型
-            existing_models = ProviderModel.query.filter_by(
-                tenant_id=tenant_id,
-                provider_name=provider_name
-            ).all()
-            existing_model_dict = {model.model_name: model for model in existing_models}
-            
-            # 处理入参数据中的模型
-            for model_data in models_data:
-                # 检查ProviderModel是否存在
-                model_id = str(model_data.get("id"))
-                code = model_data.get("code")
-                provider_model_name = f"{model_id}/{code}"
-                existing_provider_model = existing_model_dict.get(provider_model_name)
-                
-                if existing_provider_model:
-                    # 如果模型已存在，从字典中删除
-                    del existing_model_dict[provider_model_name]
-                    results.append({"model_id": provider_model_name, "status": "existed"})
-                else:
-                    # 如果模型不存在，创建新记录
-                    name = model_data.get("name")
-                    vision = bool(model_data.get("vision", 0))
-                    search = bool(model_data.get("search", 0))
-                    rerank = bool(model_data.get("rerank", 0))
-                    functioncall = bool(model_data.get("functioncall", 0))
-                    reasoning = bool(model_data.get("reasoning", 0))
-                    embedding = bool(model_data.get("embedding", 0))
-                    
-                    model_type = "text-generation"  # 默认值
-                    if embedding:
-                        model_type = "text-embedding"
-                    elif rerank:
-                        model_type = "rerank"
-                    though_support = "supported" if reasoning else "not_supported"
-                    
-                    encrypted_config = json.dumps({
-                        "display_name": name,
-                        "endpoint_model_name": provider_model_name,
-                        "api_key": api_key,
-                        "endpoint_url": "https://www.taidesk.com/compatible-mode/v1",
-                        "mode": "chat",
-                        "agent_though_support": though_support,
-                        "vision_support": str(vision).lower(),
-                        "function_call_support": str(functioncall).lower()
-                    })
-                    
-                    # 创建ProviderModelCredential
-                    new_credential = ProviderModelCredential(
-                        id=str(uuid.uuid4()),  # 生成新的UUID
-                        tenant_id=tenant_id,
-                        provider_name=provider_name,
-                        model_name=provider_model_name,
-                        model_type=model_type,
-                        credential_name="taidesk_credential",
-                        encrypted_config=encrypted_config
-                    )
-                    db.session.add(new_credential)
-                    db.session.flush()  # 确保new_credential获得ID
-                    
-                    # 创建ProviderModel
-                    new_provider_model = ProviderModel(
-                        id=str(uuid.uuid4()),  # 生成新的UUID作为主键
-                        tenant_id=tenant_id,
-                        provider_name=provider_name,
-                        model_name=provider_model_name,
-                        model_type=model_type,
-                        credential_id=new_credential.id,  # 关联credential_id
-                        is_valid=True
-                    )
-                    db.session.add(new_provider_model)
-                    results.append({"model_id": provider_model_name, "status": "created"})
-            
-            # 收集需要删除的模型
-            models_to_delete = []
-            credentials_to_delete = []
-            
-            if existing_model_dict:
-                models_to_delete = list(existing_model_dict.values())
-                
-                # 通过查询数据库收集需要删除的credential
-                for model in models_to_delete:
-                    model_credentials = ProviderModelCredential.query.filter_by(
-                        tenant_id=model.tenant_id,
-                        provider_name=model.provider_name,
-                        model_name=model.model_name
-                    ).all()
-                    credentials_to_delete.extend(model_credentials)
-                
-                # 批量删除收集到的模型和凭证
-                for credential in credentials_to_delete:
-                    db.session.delete(credential)
-                for model in models_to_delete:
-                    db.session.delete(model)
-                
-                # 添加删除结果到返回列表
-                for provider_model_name in existing_model_dict.keys():
-                    results.append({"model_id": provider_model_name, "status": "deleted"})
-            
-            db.session.commit()
+            # 整个模型同步是一个事务（未出现在入参中的模型在同一事务中删除）；
+            # 死锁/序列化失败会中止整个事务，因此回滚后从头重试整个同步，而不是在保存点内重试某一块
+            results = run_with_retry(
+                lambda: ModelManagementService._sync_models_transaction(records, api_key, chunker),
+                rollback=db.session.rollback,
+                description="模型同步"
+            )
         except Exception as e:
             db.session.rollback()
             logger.error(f"同步模型时出错: {str(e)}")
@@ -173,3 +96,138 @@ class ModelManagementService:
             if db.session.is_active:
                 db.session.close()
         return results
+
+    @staticmethod
+    def _sync_models_transaction(records, api_key: Optional[str], chunker: AdaptiveChunker) -> List[Dict[str, Any]]:
+        """执行一次完整的模型同步并提交；失败时由调用方回滚，可以从头重复执行"""
+        results = []
+        first_tenant = Tenant.query.first()
+        if not first_tenant:
+            raise TenantNotFoundError("dify还没初始化workspace")
+        tenant_id = first_tenant.id
+        # provider_name = f"{tenant_id}/taimodel/taimodel"
+        provider_name = TAIDESK_PROVIDER_NAME
+        
+        # 查询数据库中该提供商的所有模型
+        existing_models = ProviderModel.query.filter_by(
+            tenant_id=tenant_id,
+            provider_name=provider_name
+        ).all()
+        existing_model_dict = {model.model_name: model for model in existing_models}
+        
+        # 处理入参数据中的模型，按块写入
+        for chunk in chunker.chunks(records, db.session):
+            chunk_results, matched = ModelManagementService._write_model_chunk(
+                chunk, existing_model_dict, tenant_id, provider_name, api_key
+            )
+            for provider_model_name in matched:
+                del existing_model_dict[provider_model_name]
+            results.extend(chunk_results)
+
+        # 收集需要删除的模型
+        models_to_delete = []
+        credentials_to_delete = []
+        
+        if existing_model_dict:
+            models_to_delete = list(existing_model_dict.values())
+            
+            # 通过查询数据库收集需要删除的credential
+            for model in models_to_delete:
+                model_credentials = ProviderModelCredential.query.filter_by(
+                    tenant_id=model.tenant_id,
+                    provider_name=model.provider_name,
+                    model_name=model.model_name
+                ).all()
+                credentials_to_delete.extend(model_credentials)
+            
+            # 批量删除收集到的模型和凭证
+            for credential in credentials_to_delete:
+                db.session.delete(credential)
+            for model in models_to_delete:
+                db.session.delete(model)
+            
+            # 添加删除结果到返回列表
+            for provider_model_name in existing_model_dict.keys():
+                results.append({"model_id": provider_model_name, "status": "deleted"})
+        
+        db.session.commit()
+        return results
+
+    @staticmethod
+    def plan_sync_models(models_data) -> List[Dict[str, Any]]:
+        """
+        只读计算一次模型同步会做什么：逐模型返回 create / noop（已存在），未出现在入参中的已有模型为 delete；
+        不生成加密配置、不写库。模型同步不更新已存在的模型。
+        """
+        records = parse_sync_models(models_data)
+        first_tenant = Tenant.query.first()
+        if not first_tenant:
+            raise TenantNotFoundError("dify还没初始化workspace")
+        remaining = set(db.session.scalars(
+            select(ProviderModel.model_name).where(
+                ProviderModel.tenant_id == first_tenant.id,
+                ProviderModel.provider_name == TAIDESK_PROVIDER_NAME
+            )
+        ))
+        results = []
+        for record in records:
+            provider_model_name = record.provider_model_name
+            # 与同步一致：已存在的模型只匹配一次，重复出现的记录会新建
+            if provider_model_name in remaining:
+                remaining.discard(provider_model_name)
+                results.append({"model_id": provider_model_name, "status": "noop"})
+            else:
+                results.append({"model_id": provider_model_name, "status": "create"})
+        results.extend({"model_id": name, "status": "delete"} for name in sorted(remaining))
+        return results
+
+    @staticmethod
+    def _write_model_chunk(chunk, existing_model_dict: Dict[str, "ProviderModel"], tenant_id: str,
+                           provider_name: str, api_key: Optional[str]):
+        """
+        写入一个块的新模型并flush，返回 (逐模型结果, 已存在的模型名)。
+        不修改 existing_model_dict，由调用方在块完成后更新。
+        """
+        chunk_results = []
+        matched = []
+        for record in chunk:
+            # 检查ProviderModel是否存在
+            provider_model_name = record.provider_model_name
+            existing_provider_model = existing_model_dict.get(provider_model_name)
+
+            if existing_provider_model and provider_model_name not in matched:
+                # 如果模型已存在，记录下来，块成功后再从字典中删除
+                matched.append(provider_model_name)
+                chunk_results.append({"model_id": provider_model_name, "status": "existed"})
+            else:
+                # 如果模型不存在，创建新记录
+                model_type = record.model_type
+                encrypted_config = build_encrypted_config(record, api_key)
+
+                # 创建ProviderModelCredential
+                new_credential = ProviderModelCredential(
+                    id=str(uuid.uuid4()),  # 生成新的UUID
+                    tenant_id=tenant_id,
+                    provider_name=provider_name,
+                    model_name=provider_model_name,
+                    model_type=model_type,
+                    credential_name=TAIDESK_CREDENTIAL_NAME,
+                    encrypted_config=encrypted_config
+                )
+                db.session.add(new_credential)
+
+                # 创建ProviderModel
+                new_provider_model = ProviderModel(
+                    id=str(uuid.uuid4()),  # 生成新的UUID作为主键
+                    tenant_id=tenant_id,
+                    provider_name=provider_name,
+                    model_name=provider_model_name,
+                    model_type=model_type,
+                    credential_id=new_credential.id,  # 关联credential_id
+                    is_valid=True
+                )
+                db.session.add(new_provider_model)
+                chunk_results.append({"model_id": provider_model_name, "status": "created"})
+        # 每块flush一次，分块器据此测量内存
+        db.session.flush()
+        return chunk_results, matched
@@ -0,0 +1,340 @@
+import base64
+import binascii
+import hashlib
+import json
+from datetime import datetime, timezone
+from typing import Annotated, Any, Dict, List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, TypeAdapter, ValidationError, field_validator
+
+
+def _coerce_id(value: Any) -> Any:
+    # TAIDESK的id（以及手机号）可能是超长整数，统一规范为字符串
+    if isinstance(value, bool):
+        raise ValueError("must be a string or integer")
+    if isinstance(value, int):
+        return str(value)
+    return value
+
+
+def _truthy(value: Any) -> bool:
+    # 与原实现一致按真值判断，TAIDESK会对未设置的开关传null
+    return bool(value)
+
+
+def _blank_to_none(value: Any) -> Any:
+    if isinstance(value, str) and not value.strip():
+        return None
+    return value
+
+
+StrId = Annotated[str, BeforeValidator(_coerce_id), Field(min_length=1)]
+NonEmptyStr = Annotated[str, Field(min_length=1, max_length=255)]
+Flag = Annotated[bool, BeforeValidator(_truthy)]
+
+
+# 异常类定义
+class PayloadValidationError(ValueError):
+    """请求载荷校验失败，errors 中包含每条记录的下标与字段错误"""
+
+    def __init__(self, message: str, errors: List[Dict[str, Any]]):
+        super().__init__(message)
+        self.errors = errors
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"error": str(self), "details": self.errors}
+
+
+class SyncAccountRecord(BaseModel):
+    """TAIDESK全量同步中的单个用户记录"""
+
+    model_config = ConfigDict(str_strip_whitespace=True, populate_by_name=True, frozen=True)
+
+    id: StrId
+    # 与原实现一致，realName 可以缺省；缺省时更新不改姓名，新建时见 account_name
+    real_name: Annotated[Optional[NonEmptyStr], BeforeValidator(_blank_to_none)] = Field(default=None, alias="realName")
+    # 手机号、租户ID可能以数字形式传入，统一规范为字符串
+    phone: Optional[Annotated[str, BeforeValidator(_coerce_id)]] = None
+    tenant_id: Optional[Annotated[str, BeforeValidator(_coerce_id)]] = Field(default=None, alias="tenantId")
+    admin: Flag = False
+    role_name: Optional[str] = Field(default=None, alias="roleName")
+    avatar: Optional[str] = None
+
+    @property
+    def email(self) -> str:
+        # 使用phone或id生成email
+        return f"{self.phone}@taidesk.com" if self.phone else f"u_{self.id}@taidesk.com"
+
+    @property
+    def account_name(self) -> str:
+        # 新建账户时的姓名；未提供 realName 时使用邮箱的本地部分（accounts.name 不允许为空）
+        return self.real_name or self.email.split("@", 1)[0]
+
+    @property
+    def role(self) -> str:
+        return "admin" if self.admin else self.role_name if self.role_name else "normal"
+
+
+class SyncModelRecord(BaseModel):
+    """TAIDESK模型同步中的单个模型记录"""
+
+    model_config = ConfigDict(str_strip_whitespace=True, frozen=True, protected_namespaces=())
+
+    id: StrId
+    code: NonEmptyStr
+    name: Optional[str] = None
+    vision: Flag = False
+    search: Flag = False
+    rerank: Flag = False
+    functioncall: Flag = False
+    reasoning: Flag = False
+    embedding: Flag = False
+
+    @property
+    def provider_model_name(self) -> str:
+        return f"{self.id}/{self.code}"
+
+    @property
+    def model_type(self) -> str:
+        if self.embedding:
+            return "text-embedding"
+        if self.rerank:
+            return "rerank"
+        return "text-generation"
+
+    @property
+    def though_support(self) -> str:
+        return "supported" if self.reasoning else "not_supported"
+
+
+class AccountCreatePayload(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True, extra="ignore")
+
+    email: NonEmptyStr
+    name: NonEmptyStr
+    interface_language: str = "en-US"
+    password: Optional[str] = None
+    interface_theme: str = "light"
+    role: str = "editor"
+    tenant_id: Optional[str] = None
+
+
+class AccountUpdatePayload(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True, extra="ignore")
+
+    email: NonEmptyStr
+    name: Optional[NonEmptyStr] = None
+    new_email: Optional[NonEmptyStr] = None
+    interface_language: Optional[str] = None
+    interface_theme: Optional[str] = None
+    role: Optional[str] = None
+    tenant_id: Optional[str] = None
+    # 开启写合并时，要求本次更新在响应前提交
+    durable: bool = False
+
+
+class AccountDeletePayload(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True, extra="ignore")
+
+    email: NonEmptyStr
+
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """将分页位置编码为不透明的游标字符串"""
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("cursor is not a valid cursor") from None
+    if not isinstance(position, dict):
+        raise ValueError("cursor is not a valid cursor")
+    return position
+
+
+def _parse_cursor(value: Any) -> Any:
+    if isinstance(value, str):
+        return decode_cursor(value) if value else None
+    return value
+
+
+Cursor = Annotated[Optional[Dict[str, Any]], BeforeValidator(_parse_cursor)]
+
+
+def _check_timestamp(value: Any) -> None:
+    if not isinstance(value, str):
+        raise ValueError("cursor is not a valid cursor")
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError("cursor is not a valid cursor") from None
+
+
+def _check_keyset_position(value: Any, numeric_id: bool = False) -> None:
+    """变更流游标中一张表的分页位置：None 或 [updated_at的ISO格式, 字符串形式的id]"""
+    if value is None:
+        return
+    if not isinstance(value, list) or len(value) != 2 or not isinstance(value[1], str):
+        raise ValueError("cursor is not a valid cursor")
+    if numeric_id and not value[1].isdigit():
+        raise ValueError("cursor is not a valid cursor")
+    _check_timestamp(value[0])
+
+
+class ChangesSincePayload(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    since: Optional[datetime] = None
+    cursor: Cursor = None
+    limit: int = Field(default=500, ge=1, le=5000)
+
+    @field_validator("cursor")
+    @classmethod
+    def _check_cursor(cls, value: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if value is not None:
+            _check_keyset_position(value.get("accounts"))
+            _check_keyset_position(value.get("memberships"), numeric_id=True)
+            if value.get("since") is not None:
+                _check_timestamp(value["since"])
+        return value
+
+    @field_validator("since")
+    @classmethod
+    def _to_naive_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        # 数据库中的时间戳均为不带时区的UTC时间
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+
+class SyncOptionsPayload(BaseModel):
+    """sync / models 请求中与记录无关的选项"""
+    model_config = ConfigDict(extra="ignore")
+
+    # 重叠同步的处理策略，缺省时取 SYNC_CONCURRENCY_POLICY
+    on_conflict: Optional[Literal["wait", "coalesce", "reject"]] = None
+    # 分区并行写入的分区数（仅 sync 使用）；实际分区数还受 SYNC_MAX_PARTITIONS 与连接池大小限制
+    partitions: Optional[int] = Field(default=None, ge=1, le=64)
+
+
+class SearchAccountsPayload(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True, extra="ignore")
+
+    # *_prefix 区分大小写，*_contains 不区分大小写，见 AccountManagementService.search_accounts
+    email_prefix: Optional[NonEmptyStr] = None
+    email_contains: Optional[NonEmptyStr] = None
+    name_prefix: Optional[NonEmptyStr] = None
+    name_contains: Optional[NonEmptyStr] = None
+    status: Optional[str] = None
+    tenant_id: Optional[str] = None
+    role: Optional[str] = None
+    limit: int = Field(default=50, ge=1, le=1000)
+    cursor: Cursor = None
+
+    @field_validator("cursor")
+    @classmethod
+    def _check_cursor(cls, value: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if value is not None and not (isinstance(value.get("email"), str) and isinstance(value.get("id"), str)):
+            raise ValueError("cursor is not a valid cursor")
+        return value
+
+
+# 模块加载时编译校验器，避免每次请求重复构建schema
+SYNC_ACCOUNTS_ADAPTER = TypeAdapter(List[SyncAccountRecord])
+SYNC_MODELS_ADAPTER = TypeAdapter(List[SyncModelRecord])
+
+
+def _format_errors(exc: ValidationError, batch: bool) -> List[Dict[str, Any]]:
+    errors = []
+    for err in exc.errors(include_url=False):
+        loc = list(err.get("loc", ()))
+        index = None
+        if batch and loc and isinstance(loc[0], int):
+            index = loc.pop(0)
+        errors.append({
+            "index": index,
+            "field": ".".join(str(part) for part in loc) or None,
+            "message": err.get("msg"),
+        })
+    return errors
+
+
+def _validate_batch(adapter: TypeAdapter, items: Any, label: str) -> list:
+    if items is None:
+        return []
+    try:
+        return adapter.validate_python(items)
+    except ValidationError as e:
+        errors = _format_errors(e, batch=True)
+        bad_indexes = sorted({err["index"] for err in errors if err["index"] is not None})
+        raise PayloadValidationError(
+            f"Invalid {label} payload: {len(bad_indexes)} record(s) rejected", errors
+        ) from None
+
+
+def parse_sync_accounts(items: Any) -> List[SyncAccountRecord]:
+    """一次性校验并规范化整个用户同步批次"""
+    return _validate_batch(SYNC_ACCOUNTS_ADAPTER, items, "sync")
+
+
+def parse_sync_models(items: Any) -> List[SyncModelRecord]:
+    """一次性校验并规范化整个模型同步批次"""
+    return _validate_batch(SYNC_MODELS_ADAPTER, items, "models")
+
+
+def batch_fingerprint(records: List[BaseModel], *options: Any) -> str:
+    """
+    已校验批次的摘要，用于判断两个同步请求的载荷是否相同；
+    options 为同样影响写入结果的参数（如 mode、partitions）
+    """
+    digest = hashlib.sha256(json.dumps(options, default=str).encode("utf-8"))
+    for record in records:
+        digest.update(b"\n")
+        digest.update(record.model_dump_json().encode("utf-8"))
+    return digest.hexdigest()
+
+
+def parse_account_payload(model_cls, data: Any):
+    """校验单账户操作（创建/更新/删除）的载荷"""
+    try:
+        return model_cls.model_validate(data or {})
+    except ValidationError as e:
+        raise PayloadValidationError(
+            f"Invalid {model_cls.__name__} payload", _format_errors(e, batch=False)
+        ) from None
+
+
+def dedupe_sync_accounts(records: List[SyncAccountRecord]) -> Tuple[List[SyncAccountRecord], List[Dict[str, Any]]]:
+    """
+    按派生邮箱和id为同步批次建立哈希索引，合并完全重复的记录，标记冲突记录
+    :param records: 已校验的同步记录
+    :return: (仅包含唯一键的记录列表, 被跳过记录的结果列表)
+    """
+    by_email: Dict[str, int] = {}
+    by_id: Dict[str, int] = {}
+    unique: List[SyncAccountRecord] = []
+    skipped: List[Dict[str, Any]] = []
+    for index, record in enumerate(records):
+        email = record.email
+        first = by_email.get(email)
+        if first is None:
+            first = by_id.get(record.id)
+        if first is None:
+            by_email[email] = len(unique)
+            by_id[record.id] = len(unique)
+            unique.append(record)
+            continue
+        kept = unique[first]
+        if record == kept:
+            status, error = "duplicate", None
+        elif kept.email == email:
+            status, error = "conflict", f"email {email} is already used by user {kept.id} in this batch"
+        else:
+            status, error = "conflict", f"id {record.id} is already used by {kept.email} in this batch"
+        entry = {"user_id": record.id, "index": index, "status": status}
+        if error:
+            entry["error"] = error
+        skipped.append(entry)
+    return unique, skipped
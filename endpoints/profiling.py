@@ -0,0 +1,134 @@
+import cProfile
+import hmac
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from werkzeug import Request
+
+from .database_config import DatabaseConfig
+
+# 携带与端点设置中 api_key 相同值的请求头才允许开启/读取性能剖析
+PROFILE_KEY_HEADER = "X-Api-Key"
+# tracemalloc 保存的调用栈深度
+TRACEMALLOC_FRAMES = 1
+
+# 同一时间只剖析一个请求：tracemalloc是进程级的，并发剖析的分配统计会相互混杂
+_profile_lock = threading.Lock()
+
+
+def is_authorized(r: Request, settings: Mapping) -> bool:
+    expected = (settings or {}).get("api_key")
+    provided = r.headers.get(PROFILE_KEY_HEADER)
+    if not expected or not provided:
+        return False
+    return hmac.compare_digest(str(expected).encode("utf-8"), provided.encode("utf-8"))
+
+
+class ProfileStore:
+    """最近的剖析结果，按条数有界"""
+
+    def __init__(self, size: int):
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._entries)
+
+
+def _top_functions(profiler: cProfile.Profile, top_n: int) -> List[Dict[str, Any]]:
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:top_n]
+    return [
+        {
+            "function": f"{filename}:{line}({name})",
+            "ncalls": primitive_calls if primitive_calls == total_calls else f"{total_calls}/{primitive_calls}",
+            "tottime_ms": round(tottime * 1000, 3),
+            "cumtime_ms": round(cumtime * 1000, 3),
+        }
+        for (filename, line, name), (primitive_calls, total_calls, tottime, cumtime, _) in rows
+    ]
+
+
+def _top_allocations(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, top_n: int) -> List[Dict[str, Any]]:
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    ]
+    differences = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+    return [
+        {
+            "location": str(difference.traceback[0]),
+            "size_bytes": difference.size,
+            "size_diff_bytes": difference.size_diff,
+            "count": difference.count,
+        }
+        for difference in differences[:top_n]
+    ]
+
+
+_store: Optional[ProfileStore] = None
+_store_lock = threading.Lock()
+
+
+def get_profile_store() -> ProfileStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ProfileStore(DatabaseConfig().PROFILE_STORE_SIZE)
+    return _store
+
+
+def run_profiled(operation_type: Optional[str], fn: Callable[[], Any]) -> Tuple[Any, Optional[str]]:
+    """
+    在 cProfile + tracemalloc 下执行 fn，结果写入剖析存储，返回 (fn的返回值, 剖析ID)。
+    已有请求在剖析时直接执行 fn，剖析ID为None。
+    cProfile只统计当前线程，分区/线程池中的工作只体现为等待时间。
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return fn(), None
+    try:
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        profiler = cProfile.Profile()
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        try:
+            result = profiler.runcall(fn)
+        finally:
+            wall_ms = (time.perf_counter() - start) * 1000
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+
+        top_n = DatabaseConfig().PROFILE_TOP_N
+        profile_id = uuid.uuid4().hex[:12]
+        get_profile_store().add({
+            "id": profile_id,
+            "operation": operation_type,
+            "started_at": started_at,
+            "wall_ms": round(wall_ms, 3),
+            "peak_traced_bytes": peak,
+            "functions": _top_functions(profiler, top_n),
+            "allocations": _top_allocations(before, after, top_n),
+        })
+        return result, profile_id
+    finally:
+        _profile_lock.release()
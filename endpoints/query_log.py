@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import logging
+from dify_plugin.config.logger_format import plugin_logger_handler
+
+from .database_config import DatabaseConfig
+
+# 使用自定义处理器设置日志
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(plugin_logger_handler)
+
+# 记录的SQL文本最大长度
+MAX_STATEMENT_LENGTH = 4000
+# 只对这些语句做 EXPLAIN（不带ANALYZE，不会真正执行）
+EXPLAINABLE_PREFIXES = ("select", "insert", "update", "delete", "with")
+
+
+def parameters_shape(parameters: Any, executemany: bool = False) -> Any:
+    """只记录参数的结构和类型，不记录取值（可能包含手机号、密码哈希等敏感数据）"""
+    if executemany:
+        rows = list(parameters or [])
+        return {"rows": len(rows), "first": parameters_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+class SlowQueryLog:
+    """
+    慢查询记录器：挂在引擎的 before/after_cursor_execute 事件上，
+    耗时超过阈值的语句连同参数结构、耗时和（PostgreSQL上）执行计划写入有界环形缓冲区。
+    """
+
+    def __init__(self, threshold_ms: float, size: int, explain: bool = True):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def install(self, target=Engine) -> None:
+        """
+        注册事件监听（同一目标只注册一次）。默认挂在Engine类上，
+        覆盖进程内所有引擎，包括asyncio引擎内部的同步引擎。
+        """
+        if event.contains(target, "before_cursor_execute", self._before_cursor_execute):
+            return
+        event.listen(target, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(target, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(target, "handle_error", self._handle_error)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("taidesk_query_start", []).append(time.perf_counter())
+
+    def _handle_error(self, exception_context):
+        # 执行失败时不会触发after_cursor_execute，弹出对应的开始时间
+        conn = exception_context.connection
+        if conn is not None and exception_context.cursor is not None and conn.info.get("taidesk_query_start"):
+            conn.info["taidesk_query_start"].pop()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("taidesk_query_start")
+        if not starts:
+            return
+        duration_ms = (time.perf_counter() - starts.pop()) * 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        entry = {
+            "statement": statement[:MAX_STATEMENT_LENGTH],
+            "parameters": parameters_shape(parameters, executemany),
+            "executemany": executemany,
+            "duration_ms": round(duration_ms, 3),
+            "recorded_at": datetime.utcnow(),
+            "plan": None,
+        }
+        if self.explain and not executemany:
+            entry["plan"] = self._explain(conn, cursor, statement, parameters)
+        with self._lock:
+            self._entries.append(entry)
+            self.recorded += 1
+        logger.info(f"慢查询 {entry['duration_ms']}ms: {entry['statement'][:200]}")
+
+    @staticmethod
+    def _explain(conn, cursor, statement: str, parameters: Any) -> Optional[Any]:
+        """
+        在同一连接上获取 EXPLAIN (FORMAT JSON) 计划，仅支持 PostgreSQL + psycopg2。
+        事务中执行时包在SAVEPOINT里，EXPLAIN失败不会让业务事务进入aborted状态。
+        """
+        if conn.dialect.name != "postgresql" or conn.dialect.driver != "psycopg2":
+            return None
+        if not statement.lstrip().lower().startswith(EXPLAINABLE_PREFIXES):
+            return None
+        dbapi_connection = cursor.connection
+        in_transaction = not dbapi_connection.autocommit
+        explain_cursor = dbapi_connection.cursor()
+        try:
+            if in_transaction:
+                explain_cursor.execute("SAVEPOINT taidesk_explain")
+            try:
+                explain_cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+                plan = explain_cursor.fetchone()[0]
+            except Exception as e:
+                if in_transaction:
+                    explain_cursor.execute("ROLLBACK TO SAVEPOINT taidesk_explain")
+                logger.info(f"获取执行计划失败: {str(e)}")
+                plan = None
+            if in_transaction:
+                explain_cursor.execute("RELEASE SAVEPOINT taidesk_explain")
+            return plan
+        except Exception as e:
+            logger.error(f"获取执行计划失败: {str(e)}")
+            return None
+        finally:
+            explain_cursor.close()
+
+    def entries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "threshold_ms": self.threshold_ms,
+            "capacity": self._entries.maxlen,
+            "recorded": self.recorded,
+            "entries": self.entries(),
+        }
+
+
+_slow_query_log: Optional[SlowQueryLog] = None
+_slow_query_log_lock = threading.Lock()
+
+
+def get_slow_query_log() -> Optional[SlowQueryLog]:
+    """返回进程内的慢查询记录器；SLOW_QUERY_LOG_ENABLED 未开启时返回None"""
+    global _slow_query_log
+    if _slow_query_log is None:
+        config = DatabaseConfig()
+        if not config.SLOW_QUERY_LOG_ENABLED:
+            return None
+        with _slow_query_log_lock:
+            if _slow_query_log is None:
+                _slow_query_log = SlowQueryLog(
+                    config.SLOW_QUERY_THRESHOLD_MS,
+                    config.SLOW_QUERY_LOG_SIZE,
+                    config.SLOW_QUERY_EXPLAIN,
+                )
+    return _slow_query_log
+
+
+def install_slow_query_log() -> None:
+    """开启慢查询记录时注册引擎事件监听，未开启时不做任何事（没有额外开销）"""
+    slow_query_log = get_slow_query_log()
+    if slow_query_log is not None:
+        slow_query_log.install()
+
+
+def slow_query_stats() -> Dict[str, Any]:
+    slow_query_log = get_slow_query_log()
+    if slow_query_log is None:
+        return {"enabled": False}
+    return slow_query_log.stats()
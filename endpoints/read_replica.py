@@ -0,0 +1,89 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+import logging
+from dify_plugin.config.logger_format import plugin_logger_handler
+
+# 使用自定义处理器设置日志
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(plugin_logger_handler)
+
+# 副本复制延迟（秒）；主库上或WAL已全部回放时为0，
+# 避免主库空闲时 pg_last_xact_replay_timestamp() 变旧被误判为延迟
+POSTGRES_REPLICA_LAG_SQL = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+
+class ReplicaRouter:
+    """
+    只读操作的引擎选择：副本可连接且复制延迟不超过阈值时使用副本，否则回退到主库。
+    健康检查结果缓存 check_interval 秒，避免每个请求都额外查询一次副本；
+    到期后由一个请求在锁外探测，探测期间其他请求沿用上一次的结果，不会排队等待。
+    """
+
+    def __init__(self, max_lag: float, check_interval: float):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._checking = False
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.replica_reads = 0
+        self.fallbacks = 0
+
+    def _check(self, replica) -> None:
+        # 不持有 self._lock：副本连接缓慢或超时时只阻塞发起探测的这一个请求
+        try:
+            with replica.connect() as connection:
+                if replica.dialect.name == "postgresql":
+                    lag = float(connection.execute(POSTGRES_REPLICA_LAG_SQL).scalar() or 0)
+                else:
+                    connection.execute(text("SELECT 1"))
+                    lag = 0.0
+            healthy = lag <= self.max_lag
+            error = None if healthy else f"replication lag {lag:.1f}s exceeds {self.max_lag}s"
+        except Exception as e:
+            lag, healthy, error = None, False, str(e)
+        with self._lock:
+            self.lag, self.healthy, self.last_error = lag, healthy, error
+            self._checked_at = time.monotonic()
+            self._checking = False
+        if not healthy:
+            logger.info(f"只读副本不可用，回退到主库: {error}")
+
+    def choose(self, primary, replica):
+        """返回本次只读操作使用的引擎"""
+        with self._lock:
+            probe = not self._checking and time.monotonic() - self._checked_at >= self.check_interval
+            if probe:
+                self._checking = True
+        if probe:
+            self._check(replica)
+        with self._lock:
+            if self.healthy:
+                self.replica_reads += 1
+                return replica
+            self.fallbacks += 1
+            return primary
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "configured": True,
+                "healthy": self.healthy,
+                "lag_seconds": self.lag,
+                "max_lag_seconds": self.max_lag,
+                "last_error": self.last_error,
+                "replica_reads": self.replica_reads,
+                "fallbacks": self.fallbacks,
+            }
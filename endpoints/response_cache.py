@@ -0,0 +1,44 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Union
+
+Body = Union[str, bytes]
+
+
+class BodyCache:
+    """
+    按校验值（ETag）缓存序列化后的响应体，按总字节数做LRU淘汰。
+    键中包含校验值，数据变化后旧条目自然失效，无需显式清理。
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Body]" = OrderedDict()
+        self._size = 0
+
+    def get(self, key: Hashable) -> Optional[Body]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key: Hashable, body: Body) -> None:
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = body
+            self._size += size
+            while self._size > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
@@ -0,0 +1,121 @@
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy.exc import DBAPIError
+import logging
+from dify_plugin.config.logger_format import plugin_logger_handler
+
+from .database_config import DatabaseConfig
+
+# 使用自定义处理器设置日志
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(plugin_logger_handler)
+
+# 可重试的PostgreSQL错误码 -> 原因
+TRANSIENT_SQLSTATES = {
+    "40001": "serialization_failure",
+    "40P01": "deadlock",
+    "55P03": "lock_not_available",
+}
+# 取不到错误码时（其他驱动/方言）按错误信息识别
+TRANSIENT_MESSAGES = {
+    "deadlock detected": "deadlock",
+    "could not serialize access": "serialization_failure",
+    "database is locked": "lock_not_available",
+}
+
+
+def transient_reason(exc: BaseException) -> Optional[str]:
+    """死锁、序列化失败等瞬时数据库错误返回原因，其他错误返回None"""
+    if not isinstance(exc, DBAPIError) or exc.connection_invalidated:
+        return None
+    original = exc.orig
+    sqlstate = getattr(original, "pgcode", None) or getattr(original, "sqlstate", None)
+    if sqlstate in TRANSIENT_SQLSTATES:
+        return TRANSIENT_SQLSTATES[sqlstate]
+    message = str(original).lower()
+    for marker, reason in TRANSIENT_MESSAGES.items():
+        if marker in message:
+            return reason
+    return None
+
+
+class RetryMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.recovered = 0
+        self.exhausted = 0
+        self.reasons = Counter()
+
+    def record_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def record_retry(self, reason: str) -> None:
+        with self._lock:
+            self.retries += 1
+            self.reasons[reason] += 1
+
+    def record_recovered(self) -> None:
+        with self._lock:
+            self.recovered += 1
+
+    def record_exhausted(self) -> None:
+        with self._lock:
+            self.exhausted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "recovered": self.recovered,
+                "exhausted": self.exhausted,
+                "reasons": dict(self.reasons),
+            }
+
+
+retry_metrics = RetryMetrics()
+
+
+def run_with_retry(fn: Callable[[], Any], rollback: Optional[Callable[[], None]] = None,
+                   description: str = "chunk") -> Any:
+    """
+    执行一个事务单元（一个块/分区），遇到瞬时数据库错误时先调用 rollback 回滚该单元，
+    再按带完全抖动的指数退避重试，最多 DB_RETRY_MAX_ATTEMPTS 次；非瞬时错误直接抛出。
+    fn 必须可以重复执行：重试时从头处理同一个块。
+    """
+    config = DatabaseConfig()
+    attempts = max(1, config.DB_RETRY_MAX_ATTEMPTS)
+    retry_metrics.record_call()
+    for attempt in range(1, attempts + 1):
+        try:
+            result = fn()
+        except DBAPIError as e:
+            reason = transient_reason(e)
+            if reason is None:
+                raise
+            if rollback is not None:
+                rollback()
+            if attempt == attempts:
+                retry_metrics.record_exhausted()
+                logger.error(f"{description} 重试 {attempts} 次后仍失败 ({reason}): {str(e)}")
+                raise
+            retry_metrics.record_retry(reason)
+            delay = random.uniform(0, min(config.DB_RETRY_MAX_DELAY, config.DB_RETRY_BASE_DELAY * (2 ** (attempt - 1))))
+            logger.info(f"{description} 遇到 {reason}，{delay:.3f}s 后第 {attempt + 1} 次尝试")
+            time.sleep(delay)
+            continue
+        if attempt > 1:
+            retry_metrics.record_recovered()
+        return result
+
+
+def retry_stats() -> Dict[str, Any]:
+    return retry_metrics.stats()
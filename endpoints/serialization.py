@@ -0,0 +1,52 @@
+import json
+from collections import Counter
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Iterator, Mapping, Optional
+
+from werkzeug import Response
+
+try:
+    import orjson
+except ImportError:  # orjson是可选依赖，缺失时回退到标准库
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """将对象序列化为UTF-8编码的JSON；优先使用orjson（原生datetime支持），否则使用标准库"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def iterate_then_close(iterable: Iterable[bytes], close: Callable[[], None]) -> Iterator[bytes]:
+    """流式响应体：消费完毕（或客户端断开、生成器被关闭）后才调用 close 释放请求持有的资源"""
+    try:
+        yield from iterable
+    finally:
+        close()
+
+
+def json_response(obj: Any, status: int = 200, headers: Optional[Mapping[str, str]] = None) -> Response:
+    """所有操作统一使用的JSON响应"""
+    return Response(
+        response=dumps(obj),
+        status=status,
+        headers=dict(headers or {}),
+        content_type="application/json"
+    )
+
+
+def summarize_results(results: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    """把逐条结果压缩为按状态计数的摘要"""
+    return dict(Counter(item["status"] for item in results))
@@ -0,0 +1,157 @@
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import text
+import logging
+from dify_plugin.config.logger_format import plugin_logger_handler
+
+from .db_engine import db
+from .database_config import DatabaseConfig
+
+# 使用自定义处理器设置日志
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(plugin_logger_handler)
+
+# 重叠同步的处理策略
+POLICY_WAIT = "wait"          # 等待前一个同步结束后再执行
+POLICY_COALESCE = "coalesce"  # 载荷相同时合并到正在运行的同步，直接复用其结果；否则同 wait
+POLICY_REJECT = "reject"      # 立即返回409
+SYNC_POLICIES = (POLICY_WAIT, POLICY_COALESCE, POLICY_REJECT)
+
+# 轮询 pg_try_advisory_lock 的间隔（秒）
+ADVISORY_LOCK_POLL_INTERVAL = 0.5
+
+
+# 异常类定义
+class SyncInProgressError(Exception):
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Flight:
+    def __init__(self, fingerprint: Optional[str] = None):
+        self.done = threading.Event()
+        self.fingerprint = fingerprint
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """进程内的single-flight：同一个键同时只有一个调用在执行"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+
+    def do(self, key: str, fn: Callable[[], Any], policy: str, timeout: float,
+           fingerprint: Optional[str] = None) -> Tuple[Any, bool]:
+        """
+        返回 (结果, 是否复用了正在运行的调用的结果)。
+        coalesce 只在双方 fingerprint 相同（且不为None）时复用结果，载荷不同时按 wait 处理
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = _Flight(fingerprint)
+                    self._flights[key] = flight
+
+            if leader:
+                try:
+                    flight.result = fn()
+                    return flight.result, False
+                except BaseException as e:
+                    flight.error = e
+                    raise
+                finally:
+                    with self._lock:
+                        self._flights.pop(key, None)
+                    flight.done.set()
+
+            if policy == POLICY_REJECT:
+                raise SyncInProgressError(f"Operation {key} is already running")
+            if not flight.done.wait(max(0.0, deadline - time.monotonic())):
+                raise SyncInProgressError(f"Timed out waiting for running operation {key}")
+            if policy == POLICY_COALESCE and fingerprint is not None and flight.fingerprint == fingerprint:
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result, True
+            # POLICY_WAIT（或载荷不同的 coalesce）：前一个调用结束后重新竞争执行权
+
+
+_single_flight = SingleFlight()
+
+
+def _advisory_key(key: str) -> int:
+    # 映射为有符号64位整数，高32位固定为插件命名空间，避免与Dify自身的advisory lock冲突
+    namespace = zlib.crc32(b"taidesk") & 0x7FFFFFFF
+    return (namespace << 32) | zlib.crc32(key.encode("utf-8"))
+
+
+@contextmanager
+def advisory_lock(key: str, policy: str, timeout: float):
+    """
+    PostgreSQL会话级advisory lock，用于跨进程/跨副本串行化同步；非PostgreSQL后端直接放行
+    锁持有在独立连接上，不影响业务事务的提交与回滚
+    """
+    engine = db.engine
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+
+    lock_id = _advisory_key(key)
+    connection = engine.connect()
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            acquired = connection.execute(text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": lock_id}).scalar()
+            connection.commit()
+            if acquired:
+                break
+            if policy == POLICY_REJECT or time.monotonic() >= deadline:
+                raise SyncInProgressError(f"Operation {key} is running in another worker")
+            time.sleep(ADVISORY_LOCK_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": lock_id})
+            connection.commit()
+    finally:
+        connection.close()
+
+
+def run_exclusive(operation: str, fn: Callable[[], Any], policy: Optional[str] = None,
+                  timeout: Optional[float] = None, fingerprint: Optional[str] = None) -> Tuple[Any, bool]:
+    """
+    按 (租户, 操作类型) 串行化执行 fn，需要在Flask应用上下文中调用；
+    返回 (结果, coalesced)，coalesced 为True表示结果来自合并到的另一个同步
+    :param operation: 操作类型，例如 sync / models
+    :param fn: 实际执行同步的函数
+    :param policy: wait / coalesce / reject，默认取 SYNC_CONCURRENCY_POLICY
+    :param timeout: 等待的最长秒数，默认取 SYNC_LOCK_TIMEOUT
+    :param fingerprint: 载荷摘要（batch_fingerprint），coalesce 只合并到摘要相同的同步
+    """
+    from .account_management import Tenant
+
+    config = DatabaseConfig()
+    policy = policy or config.SYNC_CONCURRENCY_POLICY
+    if policy not in SYNC_POLICIES:
+        raise ValueError(f"Invalid concurrency policy {policy}. Valid policies are {list(SYNC_POLICIES)}")
+    timeout = config.SYNC_LOCK_TIMEOUT if timeout is None else timeout
+
+    first_tenant = Tenant.query.with_entities(Tenant.id).first()
+    db.session.close()
+    key = f"{first_tenant.id if first_tenant else '-'}:{operation}"
+
+    def locked():
+        with advisory_lock(key, policy, timeout):
+            return fn()
+
+    return _single_flight.do(key, locked, policy, timeout, fingerprint)
@@ -1,13 +1,37 @@
-import json
 import traceback
+from contextlib import ExitStack
 from typing import Mapping
 from werkzeug import Request, Response
+from werkzeug.http import quote_etag
 from dify_plugin import Endpoint
 from .database_config import DatabaseConfig
-from .db_engine import db, init_db
-from .account_management import AccountManagementService
-from .model_management import ModelManagementService
-from flask import Flask
+from .admission import AdmissionRejectedError, admission_stats, admit
+from .response_cache import BodyCache
+from .serialization import dumps, iterate_then_close, json_response, summarize_results
+from .compression import (
+    CorruptRequestBodyError,
+    RequestBodyTooLargeError,
+    UnsupportedEncodingError,
+    compress_response,
+    read_json_body,
+)
+from .payload_schemas import (
+    AccountCreatePayload,
+    AccountDeletePayload,
+    AccountUpdatePayload,
+    ChangesSincePayload,
+    PayloadValidationError,
+    SearchAccountsPayload,
+    SyncOptionsPayload,
+    batch_fingerprint,
+    encode_cursor,
+    parse_account_payload,
+    parse_sync_accounts,
+    parse_sync_models,
+)
+
+# 账户列表序列化结果的进程内缓存，键为 (操作, 格式, ETag)
+listing_cache = BodyCache(DatabaseConfig().LISTING_CACHE_MAX_BYTES)
 
 
 class TaideskEndpoint(Endpoint):
@@ -16,8 +40,45 @@ class TaideskEndpoint(Endpoint):
         Invokes the endpoint with the given request.
         Supports different operation types via the 'type' field in request body.
         """
-        data = r.get_json()
+        try:
+            data = read_json_body(r) or {}
+        except UnsupportedEncodingError as e:
+            return json_response({"error": str(e)}, status=415)
+        except RequestBodyTooLargeError as e:
+            return json_response({"error": str(e)}, status=413)
+        except CorruptRequestBodyError as e:
+            return json_response({"error": str(e)}, status=400)
         operation_type = data.get("type")
+
+        # profile=true：在cProfile/tracemalloc下执行本次操作，需携带与 api_key 设置一致的 X-Api-Key
+        profile = bool(data.get("profile"))
+        if profile:
+            from .profiling import is_authorized, run_profiled
+            if not is_authorized(r, settings):
+                return json_response({"error": "Profiling requires a valid X-Api-Key header"}, status=403)
+
+        # 按操作类型做准入控制，饱和时直接返回429而不是占用连接池和CPU
+        try:
+            with ExitStack() as admission:
+                admission.enter_context(admit(operation_type))
+                if profile:
+                    response, profile_id = run_profiled(
+                        operation_type, lambda: self._dispatch(r, operation_type, data, settings)
+                    )
+                    if profile_id:
+                        response.headers["X-Profile-Id"] = profile_id
+                else:
+                    response = self._dispatch(r, operation_type, data, settings)
+                if response.is_streamed:
+                    # 流式响应（列式导出）在响应体输出完毕后才释放执行槽位
+                    response.response = iterate_then_close(response.response, admission.pop_all().close)
+        except AdmissionRejectedError as e:
+            return json_response({"error": str(e)}, status=429, headers={"Retry-After": str(e.retry_after)})
+        # 按 Accept-Encoding 压缩响应体
+        return compress_response(r, response)
+
+    def _dispatch(self, r: Request, operation_type, data: Mapping, settings: Mapping) -> Response:
+        """按 type 分发到具体操作"""
         # 打印数据库信息
         # config = DatabaseConfig()
         # config_dict = {
@@ -41,17 +102,25 @@ class TaideskEndpoint(Endpoint):
         # print(settings['api_key'])
         
 
+        # SQLAlchemy、ORM映射与各服务模块在首个操作时才导入（之后命中模块缓存），
+        # 插件加载时只引入请求解析、准入控制等轻量模块，缩短冷启动时间
+        from .db_engine import db, get_app, read_engine, read_session, replica_stats
+        from .indexes import check_indexes, ensure_indexes
+        from .account_management import AccountManagementService
+        from .model_management import ModelManagementService
+        from .async_management import AsyncAccountManagementService, AsyncModelManagementService, run_async
+        from .sync_lock import SyncInProgressError, run_exclusive
+        from .columnar_export import ExportFormatError, get_export_format, iter_account_batches
+        from .query_log import slow_query_stats
+        from .profiling import get_profile_store, is_authorized
+        from .chunking import AdaptiveChunker
+        from .retry import retry_stats
+        from .account_cache import account_cache_stats
+        from .write_behind import COALESCED_FIELDS, get_update_coalescer, write_behind_stats
+
         try:
-            # 确保数据库已初始化
-            try:
-                # 检查db是否已经与app关联
-                if db.app is None:
-                    app = Flask(__name__)
-                    init_db(app)
-            except AttributeError:
-                # 如果db.app属性不存在，则创建新app并初始化
-                app = Flask(__name__)
-                init_db(app)
+            # 进程内只创建一次Flask应用并初始化数据库
+            app = get_app()
             if operation_type == "sync":
                 """
                 {
@@ -77,155 +146,318 @@ class TaideskEndpoint(Endpoint):
                 """
                 # 全量同步操作，同步用户数据
                 try:
-                    sync_data = data.get("data", [])
+                    options = parse_account_payload(SyncOptionsPayload, data)
+                    sync_data = parse_sync_accounts(data.get("data", []))
+                    if data.get("plan"):
+                        # plan=true：只读计算将要新建/更新/无变化的账户，不写库、不加同步锁
+                        with app.app_context():
+                            results = AccountManagementService.plan_sync_accounts(sync_data)
+                        response_data = {
+                            "status": "success",
+                            "plan": True,
+                            "sync_count": len(sync_data),
+                            "summary": summarize_results(results),
+                        }
+                        if data.get("result_mode") == "full":
+                            response_data["results"] = results
+                        return json_response(response_data)
+                    # 按内存水位自适应分块，分块决策随响应返回
+                    chunker = AdaptiveChunker.from_config()
                     
+                    def run_sync():
+                        # 先写入这些邮箱已排队的合并更新，避免它们在同步提交后才落库、覆盖同步数据
+                        coalescer = get_update_coalescer()
+                        if coalescer is not None:
+                            coalescer.flush([record.email for record in sync_data])
+                        # mode=onboard 用于首次接入大租户，走COPY/集合SQL批量导入
+                        if data.get("mode") == "onboard":
+                            return AccountManagementService.bulk_onboard_accounts(sync_data)
+                        if (options.partitions or 1) > 1:
+                            # 按邮箱哈希分区，多个连接并行写入
+                            return AccountManagementService.sync_accounts_partitioned(
+                                sync_data, options.partitions
+                            )
+                        if DatabaseConfig().SQLALCHEMY_ASYNC_ENABLED:
+                            return run_async(AsyncAccountManagementService.sync_accounts, sync_data)
+                        return AccountManagementService.sync_accounts(sync_data, chunker=chunker)
+
+                    # 同一租户的重叠同步按 on_conflict / SYNC_CONCURRENCY_POLICY 串行化；
+                    # coalesce 只合并到载荷相同的同步，载荷不同时等待后写入自己的数据
+                    fingerprint = batch_fingerprint(sync_data, data.get("mode"), options.partitions)
                     with app.app_context():
-                        results = AccountManagementService.sync_accounts(sync_data)
+                        results, coalesced = run_exclusive(
+                            "sync", run_sync, options.on_conflict, fingerprint=fingerprint
+                        )
                     
-                    return Response(
-                        response=json.dumps({
-                            "status": "success",
-                            "sync_count": len(sync_data)
-                        }),
-                        status=200,
-                        content_type="application/json"
-                    )
+                    response_data = {
+                        "status": "success",
+                        "sync_count": len(sync_data),
+                        "summary": summarize_results(results),
+                        "duplicate_count": sum(1 for item in results if item["status"] == "duplicate"),
+                        "conflicts": [item for item in results if item["status"] == "conflict"]
+                    }
+                    if coalesced:
+                        # 合并到了载荷相同、正在运行的同步
+                        response_data["coalesced"] = True
+                    if chunker.chunked:
+                        response_data["chunking"] = chunker.report()
+                    # 默认只返回摘要；result_mode=full 时附带逐用户结果
+                    if data.get("result_mode") == "full":
+                        response_data["results"] = results
+                    return json_response(response_data)
+                except PayloadValidationError as e:
+                    return json_response(e.to_dict(), status=400)
+                except SyncInProgressError as e:
+                    return json_response({"error": str(e)}, status=409, headers={"Retry-After": str(e.retry_after)})
                 except Exception as e:
                     print(f"同步账户异常: {str(e)}")
                     print(f"异常堆栈:{traceback.format_exc()}")
-                    return Response(
-                        response=json.dumps({"error": str(e)}),
-                        status=500,
-                        content_type="application/json"
-                    )
+                    return json_response({"error": str(e)}, status=500)
             elif operation_type == "account_create":
                 # 创建账户
                 try:
-                    result = AccountManagementService.create_account(
-                        email=data['email'],
-                        name=data['name'],
-                        interface_language=data.get('interface_language', 'en-US'),
-                        password=data.get('password'),
-                        interface_theme=data.get('interface_theme', 'light'),
-                        role=data.get('role', 'editor'),
-                        tenant_id=data.get('tenant_id')
-                    )
-                    return Response(
-                        response=json.dumps({"status": "success", "data": result}),
-                        status=201,
-                        content_type="application/json"
-                    )
+                    payload = parse_account_payload(AccountCreatePayload, data)
+                    with app.app_context():
+                        result = AccountManagementService.create_account(
+                            email=payload.email,
+                            name=payload.name,
+                            interface_language=payload.interface_language,
+                            password=payload.password,
+                            interface_theme=payload.interface_theme,
+                            role=payload.role,
+                            tenant_id=payload.tenant_id
+                        )
+                    return json_response({"status": "success", "data": result}, status=201)
+                except PayloadValidationError as e:
+                    return json_response(e.to_dict(), status=400)
                 except Exception as e:
                     print(f"创建账户异常: {str(e)}")
-                    return Response(
-                        response=json.dumps({"error": str(e)}),
-                        status=400,
-                        content_type="application/json"
-                    )
+                    return json_response({"error": str(e)}, status=400)
             elif operation_type == "account_update":
                 # 更新账户
                 try:
-                    email = data['email']
-                    name = data.get('name')
-                    new_email = data.get('new_email')
-                    interface_language = data.get('interface_language')
-                    interface_theme = data.get('interface_theme')
-                    role = data.get('role')
-                    tenant_id = data.get('tenant_id')
-                    
-                    result = AccountManagementService.update_account(
-                        email=email,
-                        name=name,
-                        new_email=new_email,
-                        interface_language=interface_language,
-                        interface_theme=interface_theme,
-                        role=role,
-                        tenant_id=tenant_id
-                    )
-                    return Response(
-                        response=json.dumps({"status": "success", "data": result}),
-                        status=200,
-                        content_type="application/json"
-                    )
+                    payload = parse_account_payload(AccountUpdatePayload, data)
+                    coalescer = get_update_coalescer()
+                    if coalescer is not None:
+                        if payload.new_email is None:
+                            # 写合并：同一邮箱窗口内的更新合并为一次提交；durable=true 时提交后再返回
+                            changes = payload.model_dump(include=set(COALESCED_FIELDS))
+                            if payload.durable:
+                                result = coalescer.commit(payload.email, changes)
+                                if result is not None:
+                                    return json_response({"status": "success", "data": result})
+                            else:
+                                entry = coalescer.submit(payload.email, changes)
+                                if entry is not None:
+                                    return json_response({
+                                        "status": "accepted",
+                                        "data": {"email": payload.email, "coalesced_events": entry.events},
+                                    }, status=202)
+                        else:
+                            # 修改邮箱前先写入该邮箱已排队的更新
+                            coalescer.flush([payload.email])
+
+                    with app.app_context():
+                        result = AccountManagementService.update_account(
+                            email=payload.email,
+                            name=payload.name,
+                            new_email=payload.new_email,
+                            interface_language=payload.interface_language,
+                            interface_theme=payload.interface_theme,
+                            role=payload.role,
+                            tenant_id=payload.tenant_id
+                        )
+                    return json_response({"status": "success", "data": result})
+                except PayloadValidationError as e:
+                    return json_response(e.to_dict(), status=400)
                 except Exception as e:
                     print(f"更新账户异常: {str(e)}")
-                    return Response(
-                        response=json.dumps({"error": str(e)}),
-                        status=400,
-                        content_type="application/json"
-                    )
+                    return json_response({"error": str(e)}, status=400)
             elif operation_type == "account_delete":
                 # 删除账户
                 try:
-                    email = data['email']
-                    result = AccountManagementService.delete_account(email)
-                    return Response(
-                        response=json.dumps({"status": "success", "data": result}),
-                        status=200,
-                        content_type="application/json"
-                    )
+                    payload = parse_account_payload(AccountDeletePayload, data)
+                    coalescer = get_update_coalescer()
+                    if coalescer is not None:
+                        coalescer.flush([payload.email])
+                    with app.app_context():
+                        result = AccountManagementService.delete_account(payload.email)
+                    return json_response({"status": "success", "data": result})
+                except PayloadValidationError as e:
+                    return json_response(e.to_dict(), status=400)
                 except Exception as e:
                     print(f"删除账户异常: {str(e)}")
-                    return Response(
-                        response=json.dumps({"error": str(e)}),
-                        status=400,
-                        content_type="application/json"
-                    )
+                    return json_response({"error": str(e)}, status=400)
             elif operation_type == "get":
                 # 获取所有账户
                 try:
+                    # format=arrow/msgpack：按列批次流式导出，供分析任务直接加载
+                    export_format = data.get("format") or "json"
+                    if export_format != "json":
+                        content_type, encoder = get_export_format(export_format)
+                        with app.app_context():
+                            engine = read_engine()
+                        # 连接与事务保持到响应体输出完毕，校验值与导出数据读取同一快照
+                        resources = ExitStack()
+                        try:
+                            connection = resources.enter_context(engine.connect())
+                            if connection.dialect.name == "postgresql":
+                                connection.execution_options(isolation_level="REPEATABLE READ")
+                            resources.enter_context(connection.begin())
+                            # 校验值包含导出格式，不同格式的响应体不会互相命中304
+                            etag = f"{AccountManagementService.get_accounts_etag(connection)}-{export_format}"
+                            headers = {"ETag": quote_etag(etag, weak=True)}
+                            if r.if_none_match.contains_weak(etag):
+                                resources.close()
+                                return Response(status=304, headers=headers)
+                            batches = iter_account_batches(connection, DatabaseConfig().EXPORT_BATCH_SIZE)
+                            return Response(
+                                response=iterate_then_close(encoder(batches), resources.pop_all().close),
+                                status=200,
+                                headers=headers,
+                                content_type=content_type
+                            )
+                        except BaseException:
+                            resources.close()
+                            raise
 
-                    with app.app_context():
-                        result = AccountManagementService.get_all_accounts()
-                    return Response(
-                        response=json.dumps({"status": "success", "data": result}),
-                        status=200,
-                        content_type="application/json"
-                    )
+                    # 配置了只读副本时，校验值与数据都从同一个只读会话读取
+                    with app.app_context(), read_session() as session:
+                        # 先用一次聚合查询计算校验值，未变化时直接返回304
+                        etag = AccountManagementService.get_accounts_etag(session)
+                        headers = {"ETag": quote_etag(etag, weak=True)}
+                        if r.if_none_match.contains_weak(etag):
+                            return Response(status=304, headers=headers)
+
+                        body = listing_cache.get(("get", export_format, etag))
+                        if body is None:
+                            result = AccountManagementService.get_all_accounts(session)
+                            body = dumps({"status": "success", "data": result})
+                            listing_cache.put(("get", export_format, etag), body)
+                    return Response(response=body, status=200, headers=headers, content_type="application/json")
+                except ExportFormatError as e:
+                    return json_response({"error": str(e)}, status=400)
                 except Exception as e:
                     print(f"get异常: {str(e)}")
-                    return Response(
-                        response=json.dumps({"error": str(e)}),
-                        status=500,
-                        content_type="application/json"
-                    )
+                    return json_response({"error": str(e)}, status=500)
+            elif operation_type == "changes_since":
+                # 增量变更流：返回水位线之后变更的账户与成员关系
+                try:
+                    payload = parse_account_payload(ChangesSincePayload, data)
+                    with app.app_context():
+                        result = AccountManagementService.get_changes_since(
+                            payload.since, payload.cursor, payload.limit
+                        )
+                    result['next_cursor'] = encode_cursor(result['next_cursor'])
+                    return json_response({"status": "success", "data": result})
+                except PayloadValidationError as e:
+                    return json_response(e.to_dict(), status=400)
+                except Exception as e:
+                    print(f"changes_since异常: {str(e)}")
+                    return json_response({"error": str(e)}, status=500)
+            elif operation_type == "search":
+                # 服务端过滤搜索账户
+                try:
+                    payload = parse_account_payload(SearchAccountsPayload, data)
+                    with app.app_context():
+                        result = AccountManagementService.search_accounts(
+                            **payload.model_dump(exclude={"cursor", "limit"}),
+                            limit=payload.limit,
+                            cursor=payload.cursor
+                        )
+                    if result['next_cursor']:
+                        result['next_cursor'] = encode_cursor(result['next_cursor'])
+                    return json_response({"status": "success", "data": result})
+                except PayloadValidationError as e:
+                    return json_response(e.to_dict(), status=400)
+                except Exception as e:
+                    print(f"search异常: {str(e)}")
+                    return json_response({"error": str(e)}, status=500)
             elif operation_type == "models":
                 # 同步模型
                 try:
-                    models_data = data.get("data", [])
+                    options = parse_account_payload(SyncOptionsPayload, data)
+                    models_data = parse_sync_models(data.get("data", []))
+                    if data.get("plan"):
+                        # plan=true：只读计算将要新建/删除/无变化的模型，不写库、不加同步锁
+                        with app.app_context():
+                            results = ModelManagementService.plan_sync_models(models_data)
+                        response_data = {
+                            "status": "success",
+                            "plan": True,
+                            "sync_count": len(models_data),
+                            "summary": summarize_results(results),
+                        }
+                        if data.get("result_mode") != "summary":
+                            response_data["results"] = results
+                        return json_response(response_data)
+                    chunker = AdaptiveChunker.from_config()
                      
+                    def run_models():
+                        if DatabaseConfig().SQLALCHEMY_ASYNC_ENABLED:
+                            return run_async(AsyncModelManagementService.sync_models, models_data, settings)
+                        return ModelManagementService.sync_models(models_data, settings, chunker)
+
+                    # 凭据来自插件设置，同样计入载荷摘要
+                    fingerprint = batch_fingerprint(models_data, sorted(settings.items()))
                     with app.app_context():
-                        results = ModelManagementService.sync_models(models_data, settings)
+                        results, coalesced = run_exclusive(
+                            "models", run_models, options.on_conflict, fingerprint=fingerprint
+                        )
                      
-                    return Response(
-                        response=json.dumps({
-                            "status": "success",
-                            "sync_count": len(models_data),
-                            "results": results
-                        }),
-                        status=200,
-                        content_type="application/json"
-                    )
+                    response_data = {
+                        "status": "success",
+                        "sync_count": len(models_data),
+                        "summary": summarize_results(results)
+                    }
+                    if coalesced:
+                        response_data["coalesced"] = True
+                    if chunker.chunked:
+                        response_data["chunking"] = chunker.report()
+                    # 默认返回逐模型结果；result_mode=summary 时只返回摘要
+                    if data.get("result_mode") != "summary":
+                        response_data["results"] = results
+                    return json_response(response_data)
+                except PayloadValidationError as e:
+                    return json_response(e.to_dict(), status=400)
+                except SyncInProgressError as e:
+                    return json_response({"error": str(e)}, status=409, headers={"Retry-After": str(e.retry_after)})
                 except Exception as e:
                     print(f"同步模型异常: {str(e)}")
                     print(f"异常堆栈:{traceback.format_exc()}")
-                    return Response(
-                        response=json.dumps({"error": str(e)}),
-                        status=500,
-                        content_type="application/json"
-                    )
+                    return json_response({"error": str(e)}, status=500)
+            elif operation_type == "diagnostics":
+                # 诊断信息：准入控制的队列深度与拒绝计数、慢查询记录、块重试计数；
+                # 携带有效 X-Api-Key 时附带最近的请求剖析结果
+                diagnostics = {
+                    "admission": admission_stats(),
+                    "slow_queries": slow_query_stats(),
+                    "read_replica": replica_stats(),
+                    "retries": retry_stats(),
+                    "account_cache": account_cache_stats(),
+                    "write_behind": write_behind_stats(),
+                }
+                if is_authorized(r, settings):
+                    diagnostics["profiles"] = get_profile_store().entries()
+                # indexes=true：反射检查插件依赖的索引；create_indexes=true（需有效 X-Api-Key）在后台创建缺失的索引
+                if data.get("indexes") or data.get("create_indexes"):
+                    with app.app_context():
+                        engine = db.engine
+                    report = check_indexes(engine)
+                    missing = [entry["name"] for entry in report if entry["status"] in ("missing", "invalid")]
+                    if data.get("create_indexes") and missing:
+                        if not is_authorized(r, settings):
+                            return json_response({"error": "Creating indexes requires a valid X-Api-Key header"}, status=403)
+                        ensure_indexes(engine, missing)
+                        for entry in report:
+                            if entry["status"] in ("missing", "invalid"):
+                                entry["status"] = "scheduled"
+                    diagnostics["indexes"] = report
+                return json_response({"status": "success", "data": diagnostics})
             else:
-                return Response(
-                    response=json.dumps({"error": f"Unsupported operation type: {operation_type}"}),
-                    status=400,
-                    content_type="application/json"
-                )
+                return json_response({"error": f"Unsupported operation type: {operation_type}"}, status=400)
         except Exception as e:
             print(f"总异常: {str(e)}")
             print(f"异常堆栈:\n{traceback.format_exc()}")
-            return Response(
-                response=json.dumps({"error": str(e)}),
-                status=500,
-                content_type="application/json"
-            )
+            return json_response({"error": str(e)}, status=500)
 
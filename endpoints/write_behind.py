@@ -0,0 +1,219 @@
+import atexit
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+import logging
+from dify_plugin.config.logger_format import plugin_logger_handler
+
+from .db_engine import db, get_app
+from .database_config import DatabaseConfig
+from .account_cache import get_account_cache
+from .account_management import AccountManagementService
+from .retry import run_with_retry, transient_reason
+
+# 使用自定义处理器设置日志
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(plugin_logger_handler)
+
+# 可以合并的字段；new_email 会改变键，这类更新不进入队列
+COALESCED_FIELDS = ("name", "interface_language", "interface_theme", "role", "tenant_id")
+
+
+class PendingUpdate:
+    """同一邮箱在窗口内合并后的待写更新"""
+
+    def __init__(self, email: str):
+        self.email = email
+        self.changes: Dict[str, Any] = {}
+        self.events = 0
+        self.first_at = time.monotonic()
+        self.done = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[Exception] = None
+
+
+class UpdateCoalescer:
+    """
+    account_update 的写合并队列：同一邮箱在 window 秒内的更新合并为一次变更，
+    由后台线程按批（每批一个事务，每条更新一个保存点）写入。
+    """
+
+    def __init__(self, window: float, batch_size: int, max_pending: int):
+        self.window = window
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pending: "OrderedDict[str, PendingUpdate]" = OrderedDict()
+        # 取出条目与写入都在此锁内进行：同一时间只有一个批次在写，
+        # 后提交的同一邮箱更新不会被先取出、后写入的旧批次覆盖
+        self._write_lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+
+    def submit(self, email: str, changes: Dict[str, Any]) -> Optional[PendingUpdate]:
+        """合并一次更新并返回待写条目；队列已满时返回None，由调用方同步写入"""
+        with self._lock:
+            entry = self._pending.get(email)
+            if entry is None:
+                if len(self._pending) >= self.max_pending:
+                    self.rejected += 1
+                    return None
+                entry = PendingUpdate(email)
+                self._pending[email] = entry
+            else:
+                self.coalesced += 1
+            entry.changes.update({field: value for field, value in changes.items() if value is not None})
+            entry.events += 1
+            self.submitted += 1
+            self._start_worker()
+            self._wakeup.notify()
+        return entry
+
+    def commit(self, email: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        durable=true：与该邮箱的待写更新合并后立即提交，返回 update_account 的结果；
+        队列已满时返回None，由调用方同步写入
+        """
+        entry = self.submit(email, changes)
+        if entry is None:
+            return None
+        self.flush([email])
+        # 条目可能已被后台批次取走，等待其写入完成
+        entry.done.wait()
+        if entry.error is not None:
+            raise entry.error
+        return entry.result
+
+    def flush(self, emails: Optional[Iterable[str]] = None) -> List[PendingUpdate]:
+        """立即写入指定邮箱（默认全部）的待写更新"""
+        with self._write_lock:
+            with self._lock:
+                keys = list(self._pending) if emails is None else [email for email in emails if email in self._pending]
+                entries = [self._pending.pop(email) for email in keys]
+            for start in range(0, len(entries), self.batch_size):
+                self._write(entries[start:start + self.batch_size])
+        return entries
+
+    def _take_due(self) -> List[PendingUpdate]:
+        # 调用方持有 self._write_lock；条目按首次提交的顺序排列，到期的都在前面
+        now = time.monotonic()
+        entries = []
+        with self._lock:
+            while self._pending and len(entries) < self.batch_size:
+                email, entry = next(iter(self._pending.items()))
+                if entry.first_at + self.window > now:
+                    break
+                entries.append(self._pending.pop(email))
+        return entries
+
+    def _write(self, entries: List[PendingUpdate]) -> None:
+        # 调用方持有 self._write_lock
+        def write_batch():
+            for entry in entries:
+                entry.result, entry.error = None, None
+                try:
+                    with db.session.begin_nested():
+                        entry.result = AccountManagementService.update_account(
+                            entry.email, commit=False, **entry.changes
+                        )
+                except Exception as e:
+                    # 死锁/序列化失败时整批重试
+                    if transient_reason(e):
+                        raise
+                    entry.error = e
+            db.session.commit()
+
+        with get_app().app_context():
+            try:
+                run_with_retry(write_batch, rollback=db.session.rollback, description="合并更新批次")
+                # 提交成功后再清除缓存，下次读取时按已提交的值重新加载
+                get_account_cache().invalidate(entry.email for entry in entries)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"合并更新批次写入失败 ({len(entries)} 个账户): {str(e)}")
+                for entry in entries:
+                    entry.result, entry.error = None, e
+            finally:
+                failed = sum(1 for entry in entries if entry.error is not None)
+                with self._lock:
+                    self.batches += 1
+                    self.written += len(entries) - failed
+                    self.failed += failed
+                for entry in entries:
+                    if entry.error is not None:
+                        logger.info(f"合并更新 {entry.email} 未写入: {str(entry.error)}")
+                    entry.done.set()
+
+    def _start_worker(self) -> None:
+        # 调用方持有 self._lock
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="account-update-flusher", daemon=True)
+            self._worker.start()
+            atexit.register(self.flush)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._wakeup.wait()
+                oldest = next(iter(self._pending.values())).first_at
+                delay = oldest + self.window - time.monotonic()
+                if delay > 0:
+                    self._wakeup.wait(delay)
+                    continue
+            try:
+                with self._write_lock:
+                    entries = self._take_due()
+                    if entries:
+                        self._write(entries)
+            except Exception as e:
+                logger.error(f"合并更新后台刷新异常: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": True,
+                "window_seconds": self.window,
+                "pending": len(self._pending),
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "rejected": self.rejected,
+                "batches": self.batches,
+                "written": self.written,
+                "failed": self.failed,
+            }
+
+
+_coalescer: Optional[UpdateCoalescer] = None
+_coalescer_lock = threading.Lock()
+
+
+def get_update_coalescer() -> Optional[UpdateCoalescer]:
+    """未开启 ACCOUNT_UPDATE_WRITE_BEHIND 时返回None"""
+    global _coalescer
+    config = DatabaseConfig()
+    if not config.ACCOUNT_UPDATE_WRITE_BEHIND:
+        return None
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                _coalescer = UpdateCoalescer(
+                    config.ACCOUNT_UPDATE_COALESCE_WINDOW,
+                    config.ACCOUNT_UPDATE_FLUSH_BATCH_SIZE,
+                    config.ACCOUNT_UPDATE_MAX_PENDING,
+                )
+    return _coalescer
+
+
+def write_behind_stats() -> Dict[str, Any]:
+    coalescer = get_update_coalescer()
+    return coalescer.stats() if coalescer is not None else {"enabled": False}
@@ -0,0 +1,78 @@
+"""
+端点测试的公共夹具：每个测试使用独立的SQLite数据库，通过 TaideskEndpoint._invoke 发起请求。
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import event  # noqa: E402
+from werkzeug import Request  # noqa: E402
+from werkzeug.test import EnvironBuilder  # noqa: E402
+
+import endpoints.account_cache as account_cache  # noqa: E402
+import endpoints.db_engine as db_engine  # noqa: E402
+import endpoints.write_behind as write_behind  # noqa: E402
+from endpoints.account_management import Tenant  # noqa: E402
+from endpoints.db_engine import db  # noqa: E402
+from endpoints.taidesk import TaideskEndpoint  # noqa: E402
+
+SETTINGS = {"api_key": "test-key"}
+
+
+def _use_sqlite_transactions(engine):
+    """
+    pysqlite默认不发出BEGIN，SAVEPOINT会各自提交；按SQLAlchemy文档的做法由SQLAlchemy控制事务，
+    使SQLite上的保存点与回滚和PostgreSQL一致
+    """
+    @event.listens_for(engine, "connect")
+    def disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def emit_begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    database_uri = f"sqlite:///{tmp_path / 'taidesk.db'}"
+
+    def init_db(flask_app):
+        flask_app.config["SQLALCHEMY_DATABASE_URI"] = database_uri
+        flask_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+        db.init_app(flask_app)
+
+    monkeypatch.setenv("INDEX_BOOTSTRAP", "off")
+    monkeypatch.setattr(db_engine, "init_db", init_db)
+    monkeypatch.setattr(db_engine, "_app", None)
+    monkeypatch.setattr(account_cache, "_cache", None)
+    monkeypatch.setattr(write_behind, "_coalescer", None)
+
+    flask_app = db_engine.get_app()
+    with flask_app.app_context():
+        _use_sqlite_transactions(db.engine)
+        db.create_all()
+        db.session.add(Tenant(name="workspace"))
+        db.session.commit()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def call(app):
+    """以JSON请求体调用端点，返回 werkzeug Response"""
+    endpoint = TaideskEndpoint(None)
+
+    def invoke(body, headers=None, settings=SETTINGS):
+        environ = EnvironBuilder(method="POST", json=body, headers=headers or {}).get_environ()
+        return endpoint._invoke(Request(environ), {}, settings)
+
+    return invoke
@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy import event
+
+from endpoints.account_cache import get_account_cache
+from endpoints.account_management import AccountManagementService
+from endpoints.db_engine import db
+
+EMAIL = "cached@taidesk.com"
+
+
+@pytest.fixture
+def statements(app):
+    """记录应用上下文中发出的SQL语句"""
+    executed = []
+
+    def record(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", record)
+        yield executed
+        event.remove(db.engine, "before_cursor_execute", record)
+
+
+def test_cache_hit_existence_check_skips_database(statements):
+    account = AccountManagementService.create_account(email=EMAIL, name="cached")
+    statements.clear()
+
+    assert AccountManagementService._account_exists(EMAIL) == account["id"]
+    with pytest.raises(ValueError, match="already exists"):
+        AccountManagementService.create_account(email=EMAIL, name="again")
+    assert statements == []
+
+
+def test_delete_clears_cache_so_email_can_be_reused(statements):
+    AccountManagementService.create_account(email=EMAIL, name="cached")
+    AccountManagementService.delete_account(EMAIL)
+
+    assert get_account_cache().get(EMAIL) is None
+    recreated = AccountManagementService.create_account(email=EMAIL, name="recreated")
+    assert recreated["name"] == "recreated"
+
+
+def test_email_change_clears_old_entry(statements):
+    AccountManagementService.create_account(email=EMAIL, name="cached")
+    AccountManagementService.update_account(email=EMAIL, new_email="moved@taidesk.com")
+
+    assert AccountManagementService._account_exists(EMAIL) is None
+    assert AccountManagementService._account_exists("moved@taidesk.com") is not None
@@ -0,0 +1,46 @@
+import json
+
+from endpoints.payload_schemas import encode_cursor
+
+
+def _sync(call, count):
+    records = [{"id": index, "realName": f"user {index}", "phone": str(13000000000 + index)} for index in range(count)]
+    response = call({"type": "sync", "data": records})
+    assert response.status_code == 200, response.get_data()
+
+
+def _page(call, cursor=None, limit=3):
+    body = {"type": "changes_since", "limit": limit}
+    if cursor:
+        body["cursor"] = cursor
+    response = call(body)
+    assert response.status_code == 200, response.get_data()
+    return json.loads(response.get_data())["data"]
+
+
+def test_follows_multi_page_feed_to_the_end(call):
+    _sync(call, 8)
+
+    accounts, memberships, pages = [], [], 0
+    data = _page(call)
+    while True:
+        pages += 1
+        accounts += [account["id"] for account in data["accounts"]]
+        memberships += [membership["id"] for membership in data["memberships"]]
+        if not data["has_more"]:
+            break
+        data = _page(call, data["next_cursor"])
+
+    assert pages == 3
+    assert len(accounts) == len(set(accounts)) == 8
+    assert len(memberships) == len(set(memberships)) == 8
+
+    # 最后一页的游标作为水位线继续轮询，没有新的变更
+    data = _page(call, data["next_cursor"])
+    assert data["accounts"] == [] and data["memberships"] == []
+
+
+def test_rejects_non_numeric_membership_position(call):
+    cursor = encode_cursor({"accounts": None, "memberships": ["2024-01-01T00:00:00", "abc"], "since": None})
+    response = call({"type": "changes_since", "cursor": cursor})
+    assert response.status_code == 400
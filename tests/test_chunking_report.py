@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+
+def _sync(call, count):
+    records = [{"id": index, "realName": f"user {index}"} for index in range(count)]
+    response = call({"type": "sync", "data": records})
+    assert response.status_code == 200, response.get_data()
+    return json.loads(response.get_data())
+
+
+def test_single_chunk_sync_has_no_chunking_report(call):
+    assert "chunking" not in _sync(call, 2)
+
+
+def test_multi_chunk_sync_reports_chunking(call, monkeypatch):
+    monkeypatch.setenv("SYNC_CHUNK_SIZE_INITIAL", "1")
+    monkeypatch.setenv("SYNC_CHUNK_SIZE_MIN", "1")
+    monkeypatch.setenv("SYNC_CHUNK_SIZE_MAX", "1")
+    chunking = _sync(call, 3)["chunking"]
+    assert chunking["chunks"] == 3
+    assert chunking["max_size"] == 1
+
+
+@pytest.mark.parametrize("count,reported", [(2, False), (3, True)])
+def test_models_report_chunking_only_when_split(call, monkeypatch, count, reported):
+    monkeypatch.setenv("SYNC_CHUNK_SIZE_INITIAL", "2")
+    monkeypatch.setenv("SYNC_CHUNK_SIZE_MIN", "2")
+    monkeypatch.setenv("SYNC_CHUNK_SIZE_MAX", "2")
+    models = [{"id": index, "code": f"model-{index}"} for index in range(count)]
+    response = call({"type": "models", "data": models})
+    assert response.status_code == 200, response.get_data()
+    assert ("chunking" in json.loads(response.get_data())) is reported
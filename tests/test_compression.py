@@ -0,0 +1,61 @@
+import gzip
+import json
+
+import pytest
+import zstandard
+from werkzeug import Request
+from werkzeug.test import EnvironBuilder
+
+from endpoints.taidesk import TaideskEndpoint
+
+from conftest import SETTINGS
+
+BODY = json.dumps({"type": "sync", "data": [{"id": index, "realName": f"user {index}"} for index in range(3)]}).encode()
+
+COMPRESS = {"gzip": gzip.compress, "zstd": lambda data: zstandard.ZstdCompressor().compress(data)}
+
+
+@pytest.fixture
+def post(app):
+    endpoint = TaideskEndpoint(None)
+
+    def invoke(data, encoding):
+        headers = {"Content-Type": "application/json", "Content-Encoding": encoding}
+        environ = EnvironBuilder(method="POST", data=data, headers=headers).get_environ()
+        return endpoint._invoke(Request(environ), {}, SETTINGS)
+
+    return invoke
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_compressed_body_is_accepted(post, encoding):
+    response = post(COMPRESS[encoding](BODY), encoding)
+    assert response.status_code == 200, response.get_data()
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_truncated_body_is_rejected(post, encoding):
+    data = COMPRESS[encoding](BODY)
+    response = post(data[:len(data) // 2], encoding)
+    assert response.status_code == 400
+    assert "truncated" in json.loads(response.get_data())["error"]
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_corrupt_body_is_rejected(post, encoding):
+    data = bytearray(COMPRESS[encoding](BODY))
+    data[20:40] = b"\xff" * 20
+    assert post(bytes(data), encoding).status_code == 400
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_non_json_body_is_rejected(post, encoding):
+    response = post(COMPRESS[encoding](b"not json"), encoding)
+    assert response.status_code == 400
+    assert "not valid JSON" in json.loads(response.get_data())["error"]
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_decompressed_size_is_limited(post, encoding, monkeypatch):
+    monkeypatch.setenv("MAX_REQUEST_BODY_BYTES", str(1024 * 1024))
+    assert post(COMPRESS[encoding](b" " * (64 * 1024 * 1024)), encoding).status_code == 413
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from endpoints.payload_schemas import PayloadValidationError, parse_sync_accounts, parse_sync_models
+
+
+def test_sync_accepts_null_admin_and_role_name():
+    [record] = parse_sync_accounts([{"id": 1, "realName": "a", "admin": None, "roleName": None}])
+    assert record.admin is False
+    assert record.role == "normal"
+
+
+def test_sync_admin_uses_truthiness():
+    records = parse_sync_accounts([{"id": 1, "admin": 1}, {"id": 2, "admin": 0}, {"id": 3, "admin": "yes"}])
+    assert [record.admin for record in records] == [True, False, True]
+
+
+def test_sync_coerces_numeric_tenant_id_and_phone():
+    [record] = parse_sync_accounts([{"id": 1, "tenantId": 0, "phone": 13800000000}])
+    assert record.tenant_id == "0"
+    assert record.email == "13800000000@taidesk.com"
+
+
+@pytest.mark.parametrize("real_name", ["", "   ", None])
+def test_sync_blank_real_name_is_missing(real_name):
+    [record] = parse_sync_accounts([{"id": 7, "realName": real_name}])
+    assert record.real_name is None
+    assert record.account_name == "u_7"
+
+
+@pytest.mark.parametrize("value,expected", [(None, False), (2, True), (0, False), ("x", True), (True, True)])
+def test_model_flags_use_truthiness(value, expected):
+    [record] = parse_sync_models([{"id": 1, "code": "m", "vision": value, "embedding": value}])
+    assert record.vision is expected
+    assert record.embedding is expected
+
+
+def test_boolean_id_is_still_rejected():
+    with pytest.raises(PayloadValidationError):
+        parse_sync_accounts([{"id": True}])
+
+
+def test_sync_endpoint_accepts_baseline_shapes(call):
+    records = [
+        {"id": 1, "realName": "", "phone": 13800000001, "admin": None, "roleName": None, "tenantId": 0},
+        {"id": 2, "realName": "b", "admin": 1},
+    ]
+    response = call({"type": "sync", "data": records, "result_mode": "full"})
+    assert response.status_code == 200, response.get_data()
+    results = json.loads(response.get_data())["results"]
+    assert [result["status"] for result in results] == ["created", "created"]
+    assert results[0]["data"]["name"] == "13800000001"
@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+from endpoints.payload_schemas import batch_fingerprint, parse_sync_accounts
+from endpoints.sync_lock import POLICY_COALESCE, SingleFlight
+
+
+def _overlap(fingerprints):
+    """领先者阻塞期间发起第二个调用，返回各自的 (结果, 是否合并) 与实际执行的调用"""
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    executed, outcomes = [], {}
+
+    def run(name, fingerprint):
+        def fn():
+            executed.append(name)
+            if name == "leader":
+                started.set()
+                release.wait(5)
+            return name
+        outcomes[name] = flight.do("tenant:sync", fn, POLICY_COALESCE, 5, fingerprint)
+
+    leader = threading.Thread(target=run, args=("leader", fingerprints[0]))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=run, args=("follower", fingerprints[1]))
+    follower.start()
+    # 给跟随者时间进入等待
+    time.sleep(0.2)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    return outcomes, executed
+
+
+def test_coalesces_identical_payload():
+    outcomes, executed = _overlap(["same", "same"])
+    assert executed == ["leader"]
+    assert outcomes["follower"] == ("leader", True)
+
+
+@pytest.mark.parametrize("fingerprints", [["a", "b"], [None, None]])
+def test_different_payload_waits_and_runs_its_own(fingerprints):
+    outcomes, executed = _overlap(fingerprints)
+    assert executed == ["leader", "follower"]
+    assert outcomes["follower"] == ("follower", False)
+
+
+def test_fingerprint_covers_records_and_options():
+    first = parse_sync_accounts([{"id": 1, "realName": "a"}])
+    renamed = parse_sync_accounts([{"id": 1, "realName": "b"}])
+    assert batch_fingerprint(first) == batch_fingerprint(parse_sync_accounts([{"id": 1, "realName": "a"}]))
+    assert batch_fingerprint(first) != batch_fingerprint(renamed)
+    assert batch_fingerprint(first, "onboard") != batch_fingerprint(first, None)
@@ -0,0 +1,75 @@
+import json
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from endpoints.account_management import Account, AccountManagementService, TenantAccountJoin
+from endpoints.db_engine import db
+from endpoints.model_management import ModelManagementService, ProviderModel, ProviderModelCredential
+
+
+def test_transient_error_retries_the_whole_chunk(app, call, monkeypatch):
+    monkeypatch.setenv("DB_RETRY_BASE_DELAY", "0")
+    create_account = AccountManagementService.create_account
+    calls = {"count": 0}
+
+    def flaky_create_account(*args, **kwargs):
+        calls["count"] += 1
+        # 块内第3条记录第一次写入时模拟锁冲突，前两条已写入但尚未提交
+        if calls["count"] == 3:
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        return create_account(*args, **kwargs)
+
+    monkeypatch.setattr(AccountManagementService, "create_account", staticmethod(flaky_create_account))
+    records = [{"id": index, "realName": f"user {index}"} for index in range(5)]
+    response = call({"type": "sync", "data": records, "result_mode": "full"})
+    assert response.status_code == 200, response.get_data()
+
+    results = json.loads(response.get_data())["results"]
+    assert [result["status"] for result in results] == ["created"] * 5
+    with app.app_context():
+        assert db.session.scalar(select(func.count()).select_from(Account)) == 5
+        assert db.session.scalar(select(func.count()).select_from(TenantAccountJoin)) == 5
+
+
+def test_record_error_does_not_discard_the_rest_of_the_chunk(app, call, monkeypatch):
+    update_account = AccountManagementService.update_account
+
+    def failing_update_account(email, **kwargs):
+        if email == "u_1@taidesk.com":
+            raise ValueError("rejected")
+        return update_account(email, **kwargs)
+
+    records = [{"id": index, "realName": f"user {index}"} for index in range(3)]
+    assert call({"type": "sync", "data": records}).status_code == 200
+    monkeypatch.setattr(AccountManagementService, "update_account", staticmethod(failing_update_account))
+
+    renamed = [dict(record, realName=f"renamed {record['id']}") for record in records]
+    response = call({"type": "sync", "data": renamed, "result_mode": "full"})
+    assert [result["status"] for result in json.loads(response.get_data())["results"]] == ["updated", "error", "updated"]
+    with app.app_context():
+        names = dict(db.session.execute(select(Account.email, Account.name)).all())
+    assert names == {"u_0@taidesk.com": "renamed 0", "u_1@taidesk.com": "user 1", "u_2@taidesk.com": "renamed 2"}
+
+
+def test_models_sync_retries_the_whole_transaction(app, call, monkeypatch):
+    monkeypatch.setenv("DB_RETRY_BASE_DELAY", "0")
+    write_model_chunk = ModelManagementService._write_model_chunk
+    calls = {"count": 0}
+
+    def flaky_write_model_chunk(*args, **kwargs):
+        result = write_model_chunk(*args, **kwargs)
+        calls["count"] += 1
+        # 第一次写入已flush后模拟死锁，整个事务回滚后重试
+        if calls["count"] == 1:
+            raise OperationalError("INSERT", {}, Exception("deadlock detected"))
+        return result
+
+    monkeypatch.setattr(ModelManagementService, "_write_model_chunk", staticmethod(flaky_write_model_chunk))
+    models = [{"id": index, "code": f"model-{index}"} for index in range(3)]
+    response = call({"type": "models", "data": models})
+    assert response.status_code == 200, response.get_data()
+    assert json.loads(response.get_data())["summary"] == {"created": 3}
+    with app.app_context():
+        assert db.session.scalar(select(func.count()).select_from(ProviderModel)) == 3
+        assert db.session.scalar(select(func.count()).select_from(ProviderModelCredential)) == 3
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from endpoints.account_management import Account
+from endpoints.db_engine import db
+from endpoints.write_behind import get_update_coalescer
+
+EMAIL = "13800000001@taidesk.com"
+
+
+@pytest.fixture
+def write_behind(monkeypatch, app):
+    monkeypatch.setenv("ACCOUNT_UPDATE_WRITE_BEHIND", "true")
+    # 窗口足够长，排队的更新在测试期间不会被后台线程写入
+    monkeypatch.setenv("ACCOUNT_UPDATE_COALESCE_WINDOW", "60")
+    return get_update_coalescer()
+
+
+def _name(app):
+    with app.app_context():
+        return db.session.scalar(db.select(Account.name).where(Account.email == EMAIL))
+
+
+@pytest.mark.parametrize("options", [{}, {"mode": "onboard"}, {"partitions": 2}])
+def test_sync_writes_queued_update_first(app, call, write_behind, options):
+    record = {"id": 1, "phone": "13800000001"}
+    assert call({"type": "sync", "data": [dict(record, realName="created")]}).status_code == 200
+
+    queued = call({"type": "account_update", "email": EMAIL, "name": "queued"})
+    assert queued.status_code == 202, queued.get_data()
+
+    response = call(dict({"type": "sync", "data": [dict(record, realName="from sync")]}, **options))
+    assert response.status_code == 200, response.get_data()
+    assert json.loads(response.get_data())["summary"] == {"updated": 1}
+
+    # 同步之前已写入排队的更新，之后再刷新队列不会覆盖同步数据
+    write_behind.flush()
+    assert write_behind.stats()["pending"] == 0
+    assert _name(app) == "from sync"
@@ -0,0 +1,154 @@
+"""
+单账户操作热点查询的微基准。
+
+对比 account_update / account_delete / create_account 中原来的 Query.filter_by(...).first()
+与现在预先构造、带绑定参数的语句（AccountManagementService._find_*）每次调用的CPU时间、墙钟时间
+以及发出的SQL语句数；account_exists_cached 对比缓存未命中与命中时的存在性检查（命中时不查询数据库）。
+默认连接 DatabaseConfig（DB_* 环境变量或 .env）指向的库，也可以用 --database-uri 指定
+（例如 sqlite:///bench.db，会自动建表）：
+
+    python tools/bench_account_lookups.py --iterations 5000
+    python tools/bench_account_lookups.py --database-uri sqlite:///bench.db --min-speedup 1.2
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from endpoints.account_management import (  # noqa: E402
+    Account,
+    AccountManagementService,
+    Tenant,
+    TenantAccountJoin,
+)
+from endpoints.account_cache import get_account_cache  # noqa: E402
+from endpoints.db_engine import db, get_app  # noqa: E402
+
+BENCH_EMAIL = "bench-lookup@taidesk.com"
+
+
+def build_app(database_uri: str) -> Flask:
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_uri
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed() -> Dict[str, str]:
+    """确保基准使用的账户与租户成员关系存在"""
+    account = Account.query.filter_by(email=BENCH_EMAIL).first()
+    if account is None:
+        account = Account(email=BENCH_EMAIL, name="bench")
+        db.session.add(account)
+        db.session.flush()
+    tenant = Tenant.query.first()
+    if tenant is None:
+        tenant = Tenant(name="bench")
+        db.session.add(tenant)
+        db.session.flush()
+    if TenantAccountJoin.query.filter_by(tenant_id=tenant.id, account_id=account.id).first() is None:
+        db.session.add(TenantAccountJoin(tenant_id=tenant.id, account_id=account.id, role="normal"))
+    db.session.commit()
+    return {"account_id": account.id, "tenant_id": tenant.id}
+
+
+def measure(fn: Callable[[], Any], iterations: int, warmup: int) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    statements = [0]
+
+    def count_statement(*args):
+        statements[0] += 1
+
+    event.listen(db.engine, "before_cursor_execute", count_statement)
+    try:
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count_statement)
+    return {
+        "cpu_us_per_call": round(cpu / iterations * 1e6, 2),
+        "wall_us_per_call": round(wall / iterations * 1e6, 2),
+        "queries_per_call": round(statements[0] / iterations, 2),
+    }
+
+
+def run(iterations: int, warmup: int) -> Dict[str, Any]:
+    ids = seed()
+    account_id, tenant_id = ids["account_id"], ids["tenant_id"]
+    get_account_cache().put(BENCH_EMAIL, account_id)
+    cases = {
+        "account_by_email": (
+            lambda: Account.query.filter_by(email=BENCH_EMAIL).first(),
+            lambda: AccountManagementService._find_account(BENCH_EMAIL),
+        ),
+        "account_exists": (
+            lambda: Account.query.filter_by(email=BENCH_EMAIL).first(),
+            lambda: AccountManagementService._find_account_id(BENCH_EMAIL),
+        ),
+        "tenant_join": (
+            lambda: TenantAccountJoin.query.filter_by(tenant_id=tenant_id, account_id=account_id).first(),
+            lambda: AccountManagementService._find_tenant_join(tenant_id, account_id),
+        ),
+        "account_joins": (
+            lambda: TenantAccountJoin.query.filter_by(account_id=account_id).all(),
+            lambda: AccountManagementService._find_account_joins(account_id),
+        ),
+        "account_exists_cached": (
+            lambda: AccountManagementService._find_account_id(BENCH_EMAIL),
+            lambda: AccountManagementService._account_exists(BENCH_EMAIL),
+        ),
+    }
+    labels = {"account_exists_cached": ("cache_miss", "cache_hit")}
+    report = {}
+    for name, (legacy, cached) in cases.items():
+        before_label, after_label = labels.get(name, ("filter_by", "prebuilt"))
+        before = measure(legacy, iterations, warmup)
+        after = measure(cached, iterations, warmup)
+        report[name] = {
+            before_label: before,
+            after_label: after,
+            "cpu_speedup": round(before["cpu_us_per_call"] / after["cpu_us_per_call"], 2)
+            if after["cpu_us_per_call"] else None,
+        }
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--database-uri", help="benchmark against this database instead of DatabaseConfig")
+    parser.add_argument("--min-speedup", type=float, help="exit non-zero when any case's CPU speedup is below this")
+    args = parser.parse_args()
+
+    app = build_app(args.database_uri) if args.database_uri else get_app()
+    with app.app_context():
+        report = run(args.iterations, args.warmup)
+    print(json.dumps(report, indent=2))
+
+    if args.min_speedup is not None:
+        slow = [name for name, case in report.items() if (case["cpu_speedup"] or 0) < args.min_speedup]
+        if slow:
+            print(f"CPU speedup below {args.min_speedup}: {', '.join(slow)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+插件导入耗时预算检查。
+
+用 python -X importtime 在子进程中导入 endpoints.taidesk，统计插件自身（不含dify_plugin运行时）
+的累计导入耗时，并检查数据库相关的重模块没有在加载阶段被提前导入。
+超出预算或出现提前导入时以非零状态退出，可直接用于CI：
+
+    python tools/check_import_time.py --budget-ms 50
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_MODULE = "endpoints.taidesk"
+# 这些模块只应在首个操作时导入
+DEFERRED_MODULES = (
+    "sqlalchemy",
+    "flask_sqlalchemy",
+    "psycopg2",
+    "asyncpg",
+    "pyarrow",
+    "msgpack",
+    "zstandard",
+    "endpoints.db_engine",
+    "endpoints.account_management",
+    "endpoints.model_management",
+    "endpoints.async_management",
+    "endpoints.sync_lock",
+    "endpoints.columnar_export",
+    "endpoints.query_log",
+    "endpoints.read_replica",
+    "endpoints.chunking",
+    "endpoints.retry",
+    "endpoints.indexes",
+    "endpoints.write_behind",
+)
+LINE_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def measure(python: str) -> list:
+    """返回导入 ENTRY_MODULE 期间新导入的模块 [(模块名, 自身微秒, 累计微秒, 深度)]"""
+    # 先导入dify_plugin，使其依赖进入模块缓存，之后的输出只包含插件自身的导入
+    completed = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import dify_plugin; import {ENTRY_MODULE}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        sys.stderr.write(completed.stderr)
+        raise SystemExit(f"importing {ENTRY_MODULE} failed")
+
+    entries = []
+    started = False
+    for line in completed.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        if not started:
+            # dify_plugin 顶层行之后才是插件的导入
+            started = name == "dify_plugin" and not indent
+            continue
+        entries.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+        if name == ENTRY_MODULE and not indent:
+            break
+    return entries
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="plugin import budget in milliseconds")
+    parser.add_argument("--runs", type=int, default=3, help="take the fastest of N runs to reduce noise")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest modules to print")
+    parser.add_argument("--python", default=sys.executable, help="interpreter to measure")
+    args = parser.parse_args()
+
+    runs = [measure(args.python) for _ in range(max(args.runs, 1))]
+    entries = min(runs, key=lambda run: run[-1][2] if run else 0)
+    if not entries or entries[-1][0] != ENTRY_MODULE:
+        raise SystemExit(f"could not find {ENTRY_MODULE} in importtime output")
+
+    total_ms = entries[-1][2] / 1000
+    print(f"{ENTRY_MODULE}: {total_ms:.1f} ms (budget {args.budget_ms:.1f} ms)")
+    for name, self_us, cumulative_us, depth in sorted(entries, key=lambda e: e[1], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms self {cumulative_us / 1000:8.1f} ms cumulative  {name}")
+
+    failed = False
+    imported = {name for name, _, _, _ in entries}
+    eager = [
+        module for module in DEFERRED_MODULES
+        if any(name == module or name.startswith(module + ".") for name in imported)
+    ]
+    if eager:
+        failed = True
+        print("eagerly imported (should be deferred to the first operation):")
+        for name in eager:
+            print(f"  {name}")
+    if total_ms > args.budget_ms:
+        failed = True
+        print(f"import time {total_ms:.1f} ms exceeds budget {args.budget_ms:.1f} ms")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
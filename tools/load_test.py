@@ -0,0 +1,222 @@
+"""
+端点并发混合流量压测。
+
+在进程内构造 werkzeug Request，多线程并发调用 TaideskEndpoint._invoke，
+数据库连接使用 DatabaseConfig（DB_* 环境变量或 .env）指向的本地库。
+输出吞吐量、各操作类型的延迟分位数、连接池等待时间以及错误/死锁计数：
+
+    python tools/load_test.py --threads 16 --duration 60 --mix sync=1,account_update=5,get=10
+
+注意：导入dify_plugin会执行gevent的monkey patch，线程实际为协程，与插件线上运行方式一致。
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from werkzeug import Request  # noqa: E402
+from werkzeug.test import EnvironBuilder  # noqa: E402
+
+from endpoints.taidesk import TaideskEndpoint  # noqa: E402
+
+DEADLOCK_MARKERS = ("deadlock detected", "could not serialize access", "lock timeout")
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class PoolWaitRecorder:
+    """统计从连接池取连接的等待时间（包装引擎连接池的取连接方法）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waits: List[float] = []
+
+    def instrument(self, engine) -> None:
+        pool = engine.pool
+        original = pool._do_get
+
+        def timed_do_get():
+            start = time.perf_counter()
+            try:
+                return original()
+            finally:
+                with self._lock:
+                    self.waits.append((time.perf_counter() - start) * 1000)
+
+        pool._do_get = timed_do_get
+
+
+class LoadGenerator:
+    def __init__(self, args):
+        self.args = args
+        self.endpoint = TaideskEndpoint(None)
+        self.settings = {"api_key": args.api_key}
+        self.mix = parse_mix(args.mix)
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.deadlocks = 0
+        self.exceptions = 0
+
+    def _user(self, index: int) -> Dict[str, Any]:
+        return {
+            "id": self.args.id_base + index,
+            "realName": f"load-{index}",
+            "phone": str(self.args.phone_base + index),
+            "tenantId": "000000",
+        }
+
+    def build_body(self, operation: str, rng: random.Random) -> Dict[str, Any]:
+        if operation == "sync":
+            start = rng.randrange(0, max(1, self.args.users - self.args.sync_size + 1))
+            return {
+                "type": "sync",
+                "data": [self._user(start + offset) for offset in range(self.args.sync_size)],
+            }
+        if operation == "account_update":
+            index = rng.randrange(self.args.users)
+            return {
+                "type": "account_update",
+                "email": f"{self.args.phone_base + index}@taidesk.com",
+                "name": f"load-{index}-{rng.randrange(1 << 30)}",
+            }
+        if operation == "search":
+            return {"type": "search", "name_prefix": "load-", "limit": 50}
+        return {"type": operation}
+
+    def invoke(self, body: Dict[str, Any]) -> Tuple[int, bytes]:
+        builder = EnvironBuilder(method="POST", json=body)
+        response = self.endpoint._invoke(Request(builder.get_environ()), {}, self.settings)
+        # 完整消费（可能是流式的）响应体，计入延迟
+        return response.status_code, b"".join(response.iter_encoded())
+
+    def record(self, operation: str, elapsed_ms: float, status: int, payload: bytes) -> None:
+        with self._lock:
+            self.latencies[operation].append(elapsed_ms)
+            self.statuses[operation][status] += 1
+            if status >= 500 and any(marker in payload.decode("utf-8", "replace").lower() for marker in DEADLOCK_MARKERS):
+                self.deadlocks += 1
+
+    def worker(self, seed: int, deadline: float) -> None:
+        rng = random.Random(seed)
+        operations = list(self.mix)
+        weights = [self.mix[name] for name in operations]
+        while time.monotonic() < deadline:
+            operation = rng.choices(operations, weights)[0]
+            body = self.build_body(operation, rng)
+            start = time.perf_counter()
+            try:
+                status, payload = self.invoke(body)
+            except Exception as e:
+                with self._lock:
+                    self.exceptions += 1
+                print(f"{operation} raised: {e}", file=sys.stderr)
+                continue
+            self.record(operation, (time.perf_counter() - start) * 1000, status, payload)
+
+    def seed_accounts(self) -> None:
+        """压测前用一次sync写入被 account_update 使用的账户"""
+        status, payload = self.invoke({
+            "type": "sync",
+            "data": [self._user(index) for index in range(self.args.users)],
+        })
+        if status != 200:
+            raise SystemExit(f"seeding accounts failed with {status}: {payload[:500]!r}")
+
+    def run(self) -> Dict[str, Any]:
+        self.seed_accounts()
+
+        pool_waits = PoolWaitRecorder()
+        if not self.args.no_pool_timing:
+            from endpoints.db_engine import db, get_app
+            with get_app().app_context():
+                for engine in set(db.engines.values()):
+                    pool_waits.instrument(engine)
+
+        deadline = time.monotonic() + self.args.duration
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.args.threads) as executor:
+            for index in range(self.args.threads):
+                executor.submit(self.worker, self.args.seed + index, deadline)
+        wall = time.perf_counter() - started
+
+        total = sum(len(values) for values in self.latencies.values())
+        return {
+            "threads": self.args.threads,
+            "duration_s": round(wall, 3),
+            "requests": total,
+            "throughput_rps": round(total / wall, 2) if wall else 0,
+            "deadlocks": self.deadlocks,
+            "exceptions": self.exceptions,
+            "operations": {
+                operation: {
+                    "count": len(values),
+                    "p50_ms": round(percentile(values, 0.50), 2),
+                    "p95_ms": round(percentile(values, 0.95), 2),
+                    "p99_ms": round(percentile(values, 0.99), 2),
+                    "max_ms": round(max(values), 2),
+                    "statuses": dict(self.statuses[operation]),
+                }
+                for operation, values in sorted(self.latencies.items())
+            },
+            "pool_wait": {
+                "checkouts": len(pool_waits.waits),
+                "p50_ms": round(percentile(pool_waits.waits, 0.50), 3),
+                "p99_ms": round(percentile(pool_waits.waits, 0.99), 3),
+                "max_ms": round(max(pool_waits.waits), 3) if pool_waits.waits else 0,
+            },
+        }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load after seeding")
+    parser.add_argument("--mix", default="sync=1,account_update=5,get=10",
+                        help="weighted operation mix, e.g. sync=1,account_update=5,get=10,search=2")
+    parser.add_argument("--users", type=int, default=1000, help="accounts seeded and targeted by the load")
+    parser.add_argument("--sync-size", type=int, default=200, help="records per sync request")
+    parser.add_argument("--phone-base", type=int, default=19900000000, help="first synthetic phone number")
+    parser.add_argument("--id-base", type=int, default=1990000000000000000, help="first synthetic TAIDESK user id")
+    parser.add_argument("--api-key", default="load-test", help="api_key endpoint setting passed to _invoke")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-pool-timing", action="store_true", help="do not instrument the connection pool")
+    parser.add_argument("--max-p99-ms", type=float, help="exit non-zero when any operation's p99 exceeds this")
+    args = parser.parse_args()
+
+    report = LoadGenerator(args).run()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.max_p99_ms is not None:
+        slow = [name for name, stats in report["operations"].items() if stats["p99_ms"] > args.max_p99_ms]
+        if slow:
+            print(f"p99 above {args.max_p99_ms} ms: {', '.join(slow)}", file=sys.stderr)
+            return 1
+    return 1 if report["deadlocks"] or report["exceptions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())